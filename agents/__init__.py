@@ -0,0 +1,3 @@
+"""
+AI agents for the self-healing pipeline: monitoring, diagnosis and fixes.
+"""
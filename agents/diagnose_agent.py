@@ -4,61 +4,472 @@ Diagnose Agent (CrewAI-powered)
 Analyzes failure logs and suggests fixes using CrewAI agents.
 """
 
+import copy
+import hashlib
+import json
 import logging
+import os
+import sqlite3
+import sys
+import threading
+import time
+from collections import Counter, OrderedDict, deque
+from concurrent.futures import Future
+from dataclasses import dataclass
 from datetime import datetime
-from typing import Dict, Any, List
+from enum import IntEnum
+from typing import Deque, Dict, Any, List, Optional, Tuple
 import re
 
+import numpy as np
+
 # CrewAI imports
 try:
     from crewai import Agent, Task, Crew
-    from langchain_openai import ChatOpenAI
+    from langchain_openai import ChatOpenAI, OpenAIEmbeddings
     CREWAI_AVAILABLE = True
 except ImportError:
     CREWAI_AVAILABLE = False
 
 logger = logging.getLogger(__name__)
 
+# Patterns used on every diagnosis; compiled once at import time
+_MISSING_FIELD_RE = re.compile(r"missing required field '([^']+)'", re.IGNORECASE)
+_QUOTED_RE = re.compile(r"'[^']*'")
+# Transient values (timestamps, hex ids, bare numbers) that vary between repeats of the same
+# error; quoted segments are matched first so field names are never masked
+_VOLATILE_RE = re.compile(
+    r"'[^']*'"
+    r"|\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}:\d{2}(?:\.\d+)?(?:Z|[+-]\d{2}:?\d{2})?"
+    r"|\b0x[0-9a-fA-F]+\b"
+    r"|\b\d+(?:\.\d+)?\b"
+)
+
+# Keyword groups in precedence order, each mapped to the handler that diagnoses it
+_KEYWORD_HANDLERS = (
+    (("schema", "validation"), "_diagnose_schema_error"),
+    (("connection", "timeout"), "_diagnose_connection_error"),
+    (("type", "integer", "string"), "_diagnose_type_error"),
+    (("missing", "required"), "_diagnose_missing_field_error"),
+)
+_KEYWORD_RANK = {kw: rank for rank, (kws, _) in enumerate(_KEYWORD_HANDLERS) for kw in kws}
+# One alternation scans the message once instead of one `in` check per keyword
+_KEYWORD_RE = re.compile("|".join(sorted(map(re.escape, _KEYWORD_RANK), key=len, reverse=True)))
+
+# Fix lists repeated by the pattern diagnoses; history entries share these tuples
+_FIXES_REVIEW_SCHEMA = ("Review schema",)
+_FIXES_CONNECTION = ("Check API/network", "Retry with backoff")
+_FIXES_TYPE_MISMATCH = ("Add type conversion", "Check data source")
+_FIXES_MISSING_FIELD = ("Add missing field", "Provide default value")
+_FIXES_MANUAL_REVIEW = ("Manual review required",)
+_FIXES_PROVIDE_MESSAGE = ("Provide error_message",)
+_INTERNED_FIXES = {fixes: fixes for fixes in (
+    _FIXES_REVIEW_SCHEMA, _FIXES_CONNECTION, _FIXES_TYPE_MISMATCH, _FIXES_MISSING_FIELD, _FIXES_MANUAL_REVIEW,
+    _FIXES_PROVIDE_MESSAGE,
+)}
+
+# Returned without running the pattern chain or the LLM when there is nothing to analyze
+_EMPTY_MESSAGE_RESULT = {
+    "root_cause": "No error message provided",
+    "suggested_fixes": _FIXES_PROVIDE_MESSAGE,
+    "confidence": "low",
+}
+
+
+def _message_shape(message: str) -> str:
+    """Return the error message with transient values masked, keeping quoted text intact."""
+    return _VOLATILE_RE.sub(lambda m: m.group(0) if m.group(0)[0] == "'" else "#", message)
+
+
+class DiagnosisConfidence(IntEnum):
+    """Confidence of a diagnosis; the lowercase name is the wire value."""
+    UNKNOWN = 0
+    LOW = 1
+    MEDIUM = 2
+    HIGH = 3
+
+
+_CONFIDENCE_BY_NAME = {member.name.lower(): member for member in DiagnosisConfidence}
+
+
+@dataclass(frozen=True, slots=True)
+class DiagnosisRecord:
+    """Compact history entry for a diagnosis returned by DiagnoseAgent."""
+    root_cause: str
+    confidence: DiagnosisConfidence
+    suggested_fixes: Tuple[str, ...]
+    timestamp: str
+
+    @classmethod
+    def from_result(cls, result: Dict[str, Any]) -> "DiagnosisRecord":
+        fixes = result.get("suggested_fixes") or ()
+        if isinstance(fixes, str):
+            fixes = (fixes,)
+        fixes = tuple(sys.intern(str(fix)) for fix in fixes)
+        return cls(
+            root_cause=sys.intern(str(result.get("root_cause", ""))),
+            confidence=_CONFIDENCE_BY_NAME.get(str(result.get("confidence", "")).lower(), DiagnosisConfidence.UNKNOWN),
+            suggested_fixes=_INTERNED_FIXES.get(fixes, fixes),
+            timestamp=result.get("timestamp", ""),
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "root_cause": self.root_cause,
+            "confidence": self.confidence.name.lower(),
+            "suggested_fixes": list(self.suggested_fixes),
+            "timestamp": self.timestamp,
+        }
+
+
+def _manual_review(root_cause: str) -> Dict[str, Any]:
+    """Low-confidence result shared by every path that cannot produce a real diagnosis."""
+    return {"root_cause": root_cause, "suggested_fixes": list(_FIXES_MANUAL_REVIEW), "confidence": "low"}
+
+
+def _extract_first_json_object(text: str) -> Optional[str]:
+    """Return the first balanced top-level JSON object in text, scanning it once."""
+    start = text.find("{")
+    if start < 0:
+        return None
+    depth = 0
+    in_string = False
+    escape = False
+    for i in range(start, len(text)):
+        ch = text[i]
+        if in_string:
+            if escape:
+                escape = False
+            elif ch == "\\":
+                escape = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch == "{":
+            depth += 1
+        elif ch == "}":
+            depth -= 1
+            if depth == 0:
+                return text[start:i + 1]
+    return None
+
+
+class _NullHistory:
+    """History sink for agents that do not track diagnoses; discards every append."""
+    __slots__ = ()
+
+    def append(self, item: Any) -> None:
+        pass
+
+    def __len__(self) -> int:
+        return 0
+
+    def __iter__(self):
+        return iter(())
+
+
+DEFAULT_LLM_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".self_healing", "diagnose_cache.sqlite3")
+
+
+class _LLMDiagnosisCache:
+    """SQLite-backed store of parsed LLM diagnoses keyed by prompt hash, shared across restarts.
+
+    Expired rows are deleted on open and then at most once per purge_interval seconds from set().
+    """
+
+    def __init__(self, path: str, ttl_seconds: int = 86400, purge_interval: float = 3600.0):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS diagnoses "
+                "(prompt_hash TEXT PRIMARY KEY, result TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS diagnoses_expires_at ON diagnoses (expires_at)")
+        self.purge_interval = purge_interval
+        self._next_purge = 0.0
+        with self._lock, self._conn:
+            self._purge_expired(time.time())
+
+    def _purge_expired(self, now: float) -> None:
+        # Callers hold the lock and a transaction; reads already skip these rows
+        self._conn.execute("DELETE FROM diagnoses WHERE expires_at <= ?", (now,))
+        self._next_purge = now + self.purge_interval
+
+    def get(self, prompt_hash: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT result FROM diagnoses WHERE prompt_hash = ? AND expires_at > ?",
+                (prompt_hash, time.time()),
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set(self, prompt_hash: str, result: Dict[str, Any]) -> None:
+        now = time.time()
+        with self._lock, self._conn:
+            if now >= self._next_purge:
+                self._purge_expired(now)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO diagnoses (prompt_hash, result, expires_at) VALUES (?, ?, ?)",
+                (prompt_hash, json.dumps(result), now + self.ttl_seconds),
+            )
+
+    def delete(self, prompt_hash: str) -> bool:
+        with self._lock, self._conn:
+            cursor = self._conn.execute("DELETE FROM diagnoses WHERE prompt_hash = ?", (prompt_hash,))
+        return cursor.rowcount > 0
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+DEFAULT_SEMANTIC_THRESHOLD = 0.92
+
+
+class _SemanticDiagnosisCache:
+    """In-memory store of LLM diagnoses searched by cosine similarity of failure embeddings.
+
+    Vectors are normalized on insert, so a flat inner product over the matrix is the cosine
+    similarity. Slots form a ring: once max_entries is reached the oldest entry is overwritten.
+    Evicted slots keep a zero vector, which never reaches a positive threshold.
+
+    Each entry also keeps a guard (error type and quoted tokens) that a hit must match exactly,
+    and the prompt hash of its row in the exact-prompt cache so invalidation can evict both.
+    """
+
+    def __init__(self, threshold: float = DEFAULT_SEMANTIC_THRESHOLD, max_entries: int = 4096):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        # Allocated on first insert, once the embedding width is known
+        self._vectors: Optional[np.ndarray] = None
+        # (result, guard, prompt_hash) per slot, None once evicted
+        self._entries: List[Optional[Tuple[Dict[str, Any], Tuple[Any, ...], str]]] = [None] * max_entries
+        self._size = 0
+        self._next = 0
+
+    @staticmethod
+    def _normalize(vector) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def get(self, vector, guard: Tuple[Any, ...]) -> Optional[Dict[str, Any]]:
+        """Return the most similar entry above the threshold whose guard equals guard."""
+        query = self._normalize(vector)
+        with self._lock:
+            if not self._size:
+                return None
+            scores = self._vectors[:self._size] @ query
+            candidates = np.flatnonzero(scores >= self.threshold)
+            for i in candidates[np.argsort(-scores[candidates])]:
+                entry = self._entries[i]
+                if entry is not None and entry[1] == guard:
+                    return entry[0]
+            return None
+
+    def add(self, vector, result: Dict[str, Any], guard: Tuple[Any, ...], prompt_hash: str) -> None:
+        row = self._normalize(vector)
+        with self._lock:
+            if self._vectors is None:
+                self._vectors = np.zeros((self.max_entries, row.shape[0]), dtype=np.float32)
+            self._vectors[self._next] = row
+            self._entries[self._next] = (result, guard, prompt_hash)
+            self._next = (self._next + 1) % self.max_entries
+            self._size = min(self._size + 1, self.max_entries)
+
+    def invalidate(self, vector, min_similarity: float) -> List[str]:
+        """Drop every entry whose similarity to vector is at least min_similarity; return their prompt hashes."""
+        query = self._normalize(vector)
+        with self._lock:
+            if not self._size:
+                return []
+            removed = []
+            for i in np.flatnonzero(self._vectors[:self._size] @ query >= min_similarity):
+                entry = self._entries[i]
+                if entry is not None:
+                    self._vectors[i] = 0.0
+                    self._entries[i] = None
+                    removed.append(entry[2])
+            return removed
+
+
 class DiagnoseAgent:
     """Diagnoses pipeline failures and suggests fixes using CrewAI agents."""
-    def __init__(self, openai_api_key: str = None):
-        self.diagnosis_history: List[Dict[str, Any]] = []
+    def __init__(self, openai_api_key: str = None, pattern_cache_size: int = 1024,
+                 llm_cache_path: Optional[str] = None, history_limit: int = 10_000,
+                 max_concurrent_llm_calls: int = 4, track_history: bool = True,
+                 semantic_threshold: Optional[float] = None):
+        self.track_history = track_history
+        if track_history:
+            # (monotonic seconds, record) pairs, bounded so a long-running healer does not grow
+            # without limit; oldest entries drop first
+            self.diagnosis_history: Deque[Tuple[float, DiagnosisRecord]] = deque(maxlen=history_limit)
+        else:
+            # Stateless per-request use: nothing is retained and summaries are empty
+            self.diagnosis_history = _NullHistory()
+        # Appends read the clock under this lock, so history stays in timestamp order
+        self._history_lock = threading.Lock()
+        # LRU of pattern diagnoses keyed by error message digest; retry storms repeat the same message
+        self._pattern_cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._pattern_cache_size = pattern_cache_size
+        self._pattern_cache_lock = threading.Lock()
+        # Bind the dispatch table once so a diagnosis is a tuple index plus a call
+        self._pattern_handlers = tuple(getattr(self, name) for _, name in _KEYWORD_HANDLERS)
         self.openai_api_key = openai_api_key
         self.llm = ChatOpenAI(model="gpt-4", temperature=0.1, api_key=openai_api_key) if CREWAI_AVAILABLE and openai_api_key else None
-
-    def diagnose_failure(self, failure: Dict[str, Any]) -> Dict[str, Any]:
-        """Diagnose a pipeline failure and suggest fixes using CrewAI."""
-        logger.info(f"Diagnosing failure: {failure}")
-        if CREWAI_AVAILABLE and self.llm:
-            result = self._crew_diagnose(failure)
-        else:
-            result = self._pattern_diagnose(failure)
-        result["timestamp"] = datetime.now().isoformat()
-        self.diagnosis_history.append(result)
-        return result
-
-    def _crew_diagnose(self, failure: Dict[str, Any]) -> Dict[str, Any]:
-        try:
-            # Define CrewAI agents
-            root_cause_agent = Agent(
+        # LLM diagnoses are the slowest path, so keep them on disk across restarts
+        self._llm_cache = None
+        if self.llm:
+            cache_path = os.path.expanduser(llm_cache_path or os.getenv("DIAGNOSE_CACHE_PATH", DEFAULT_LLM_CACHE_PATH))
+            try:
+                self._llm_cache = _LLMDiagnosisCache(cache_path)
+            except (OSError, sqlite3.Error) as e:
+                logger.error("LLM diagnosis cache disabled: %s", e)
+        # Retries of the same failure rarely repeat the prompt byte for byte, so near-identical
+        # failures are also matched by embedding before paying for another LLM call
+        self._embeddings = None
+        self._semantic_cache = None
+        if self.llm:
+            if semantic_threshold is None:
+                semantic_threshold = float(os.getenv("DIAGNOSE_SEMANTIC_THRESHOLD", DEFAULT_SEMANTIC_THRESHOLD))
+            self._embeddings = OpenAIEmbeddings(model="text-embedding-3-small", api_key=openai_api_key)
+            self._semantic_cache = _SemanticDiagnosisCache(semantic_threshold)
+        # CrewAI agents validate and wire their LLM on construction, so build them once
+        self._crew_agents = []
+        if self.llm:
+            self._root_cause_agent = Agent(
                 role="Root Cause Analyst",
                 goal="Analyze failure logs and identify the root cause",
                 backstory="You are an expert in root cause analysis for data pipelines.",
-                verbose=True,
+                verbose=logger.isEnabledFor(logging.DEBUG),
                 allow_delegation=False,
                 llm=self.llm
             )
-            fix_suggester_agent = Agent(
+            self._fix_suggester_agent = Agent(
                 role="Fix Suggester",
                 goal="Suggest actionable fixes for pipeline failures",
                 backstory="You are a senior data engineer specializing in remediation.",
-                verbose=True,
+                verbose=logger.isEnabledFor(logging.DEBUG),
                 allow_delegation=False,
                 llm=self.llm
             )
-            # Define CrewAI task
-            task = Task(
-                description=f"""
+            self._crew_agents = [self._root_cause_agent, self._fix_suggester_agent]
+        # Concurrent requests for the same prompt share one in-flight LLM call
+        self._inflight: Dict[str, "Future[Dict[str, Any]]"] = {}
+        self._inflight_lock = threading.Lock()
+        self._llm_slots = threading.BoundedSemaphore(max_concurrent_llm_calls)
+
+    def diagnose_failure(self, failure: Dict[str, Any]) -> Dict[str, Any]:
+        """Diagnose a pipeline failure and suggest fixes using CrewAI."""
+        logger.debug("Diagnosing failure: %s", failure)
+        if not failure.get("error_message"):
+            result = {**_EMPTY_MESSAGE_RESULT, "suggested_fixes": list(_FIXES_PROVIDE_MESSAGE)}
+        elif CREWAI_AVAILABLE and self.llm:
+            result = self._crew_diagnose(failure)
+        else:
+            result = self._cached_pattern_diagnose(failure)
+        result["timestamp"] = datetime.now().isoformat()
+        if self.track_history:
+            record = DiagnosisRecord.from_result(result)
+            with self._history_lock:
+                self.diagnosis_history.append((time.monotonic(), record))
+        return result
+
+    def get_diagnosis_summary(self) -> Dict[str, Any]:
+        """Summarize diagnoses made in the last 24 hours."""
+        if not self.track_history:
+            return {"total_diagnoses": 0, "recent_diagnoses": 0, "confidence_counts": {}}
+        last_24h = time.monotonic() - 86400
+        # Timestamps are append-only, so walk back from the newest entry and stop at the first
+        # old one; deques only index cheaply at their ends, so bisect would not be O(log n)
+        recent_diagnoses = []
+        with self._history_lock:
+            for ts, diagnosis in reversed(self.diagnosis_history):
+                if ts < last_24h:
+                    break
+                recent_diagnoses.append(diagnosis)
+            total = len(self.diagnosis_history)
+        # Count the IntEnum members in C, then name only the distinct ones
+        counts = Counter(diagnosis.confidence for diagnosis in recent_diagnoses)
+        confidence_counts = {confidence.name.lower(): n for confidence, n in counts.items()}
+        return {
+            "total_diagnoses": total,
+            "recent_diagnoses": len(recent_diagnoses),
+            "confidence_counts": confidence_counts,
+        }
+
+    def close(self) -> None:
+        """Close the on-disk LLM diagnosis cache, if one is open."""
+        if self._llm_cache:
+            self._llm_cache.close()
+            self._llm_cache = None
+
+    @staticmethod
+    def prompt_hash(prompt: str) -> str:
+        """Return the cache key used for an LLM diagnosis prompt."""
+        return hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+
+    def invalidate_cache(self, prompt_hash: str) -> bool:
+        """Evict a cached LLM diagnosis, e.g. after the suggested fix failed validation."""
+        return self._llm_cache.delete(prompt_hash) if self._llm_cache else False
+
+    def invalidate_similar(self, topic: Any, min_similarity: Optional[float] = None) -> int:
+        """Evict cached LLM diagnoses close to topic and return how many were removed.
+
+        topic is either free text or a failure event, which is embedded the same way lookups are.
+        min_similarity defaults to the semantic cache's hit threshold. Every evicted semantic
+        entry also loses its exact-prompt row, and a failure event's own prompt row is evicted
+        even if its semantic entry is gone (e.g. after a restart).
+        """
+        hashes = set()
+        if self._semantic_cache:
+            text = self._semantic_text(topic) if isinstance(topic, dict) else str(topic)
+            vector = self._embed(text)
+            if vector is not None:
+                if min_similarity is None:
+                    min_similarity = self._semantic_cache.threshold
+                hashes.update(self._semantic_cache.invalidate(vector, min_similarity))
+        removed = len(hashes)
+        if isinstance(topic, dict):
+            own_hash = self.prompt_hash(self._create_diagnosis_prompt(topic))
+            if own_hash not in hashes and self.invalidate_cache(own_hash):
+                removed += 1
+        for prompt_hash in hashes:
+            self.invalidate_cache(prompt_hash)
+        return removed
+
+    @staticmethod
+    def _semantic_text(failure: Dict[str, Any]) -> str:
+        """Text embedded for the semantic cache; transient parts of the message are masked."""
+        return json.dumps({
+            "dag_id": failure.get("dag_id"),
+            "task_id": failure.get("task_id"),
+            "error_type": failure.get("error_type"),
+            "error_message": _message_shape(str(failure.get("error_message", ""))),
+        }, sort_keys=True)
+
+    @staticmethod
+    def _semantic_guard(failure: Dict[str, Any]) -> Tuple[Any, ...]:
+        """Parts a semantic hit must match exactly: embeddings barely separate 'email' from 'phone'."""
+        return (str(failure.get("error_type")), tuple(_QUOTED_RE.findall(str(failure.get("error_message", "")))))
+
+    def _embed(self, text: str) -> Optional[List[float]]:
+        try:
+            return self._embeddings.embed_query(text)
+        except Exception as e:
+            # Embedding is an optimization only; fall back to the exact-prompt path
+            logger.warning("Failure embedding failed, skipping semantic cache: %s", e)
+            return None
+
+    def _create_diagnosis_prompt(self, failure: Dict[str, Any]) -> str:
+        return f"""
                 Analyze the following pipeline failure:
                 - DAG ID: {failure.get('dag_id', 'unknown')}
                 - Task ID: {failure.get('task_id', 'unknown')}
@@ -66,64 +477,151 @@ class DiagnoseAgent:
                 - Type: {failure.get('error_type', 'unknown')}
                 - Execution Date: {failure.get('execution_date', 'unknown')}
                 Provide a JSON object with: root_cause (str), suggested_fixes (list of str), and confidence (low/medium/high).
-                """,
-                agent=root_cause_agent,
+                """
+
+    def _crew_diagnose(self, failure: Dict[str, Any]) -> Dict[str, Any]:
+        prompt = self._create_diagnosis_prompt(failure)
+        key = self.prompt_hash(prompt)
+        if self._llm_cache:
+            cached = self._llm_cache.get(key)
+            if cached is not None:
+                return cached
+        with self._inflight_lock:
+            future = self._inflight.get(key)
+            is_owner = future is None
+            if is_owner:
+                future = Future()
+                self._inflight[key] = future
+        if not is_owner:
+            # Each waiter gets its own copy because diagnose_failure stamps the result
+            return copy.deepcopy(future.result())
+        try:
+            with self._llm_slots:
+                # Only the owner pays for the embedding call; waiters share whatever it finds
+                result, vector, guard = self._semantic_lookup(failure)
+                if result is None:
+                    result = self._kickoff_diagnosis(prompt, key, vector, guard)
+            future.set_result(result)
+            return copy.deepcopy(result)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._inflight_lock:
+                self._inflight.pop(key, None)
+
+    def _semantic_lookup(self, failure: Dict[str, Any]) -> Tuple[Optional[Dict[str, Any]], Optional[List[float]], Optional[Tuple[Any, ...]]]:
+        """Return (cached diagnosis or None, embedding, guard) for a failure that missed the exact cache."""
+        if not self._semantic_cache:
+            return None, None, None
+        vector = self._embed(self._semantic_text(failure))
+        guard = self._semantic_guard(failure)
+        cached = self._semantic_cache.get(vector, guard) if vector is not None else None
+        return (copy.deepcopy(cached) if cached is not None else None), vector, guard
+
+    def _kickoff_diagnosis(self, prompt: str, key: str, vector: Optional[List[float]] = None,
+                           guard: Optional[Tuple[Any, ...]] = None) -> Dict[str, Any]:
+        try:
+            # Only the task carries per-failure state; the agents are reused
+            task = Task(
+                description=prompt,
+                agent=self._root_cause_agent,
                 expected_output="A JSON object with: root_cause, suggested_fixes, confidence"
             )
-            crew = Crew(agents=[root_cause_agent, fix_suggester_agent], tasks=[task], verbose=True)
+            crew = Crew(agents=self._crew_agents, tasks=[task], verbose=logger.isEnabledFor(logging.DEBUG))
             result = crew.kickoff()
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("CrewAI raw diagnosis result: %s", result)
             # Try to parse JSON from result
-            import json
-            import re as _re
-            match = _re.search(r'\{.*\}', str(result), _re.DOTALL)
-            if match:
-                return json.loads(match.group())
-            return {"root_cause": "CrewAI output parsing failed", "suggested_fixes": ["Manual review required"], "confidence": "low"}
+            json_text = _extract_first_json_object(str(result))
+            if json_text:
+                diagnosis = json.loads(json_text)
+                if self._llm_cache:
+                    self._llm_cache.set(key, diagnosis)
+                if vector is not None:
+                    self._semantic_cache.add(vector, diagnosis, guard, key)
+                return diagnosis
+            return _manual_review("CrewAI output parsing failed")
         except Exception as e:
-            logger.error(f"CrewAI diagnosis failed: {e}")
-            return {"root_cause": f"CrewAI error: {e}", "suggested_fixes": ["Manual review required"], "confidence": "low"}
+            logger.error("CrewAI diagnosis failed: %s", e)
+            return _manual_review(f"CrewAI error: {e}")
+
+    def _cached_pattern_diagnose(self, failure: Dict[str, Any]) -> Dict[str, Any]:
+        """Return the pattern diagnosis for this error message, reusing a previous result when possible.
+
+        Lookups try the exact message first, then its shape (transient values masked), so
+        repeats that differ only by timestamps, ids or counters share one diagnosis.
+        """
+        message = failure.get("error_message", "")
+        key = self._cache_key(message)
+        shape_key = None
+        with self._pattern_cache_lock:
+            cached = self._pattern_cache.get(key)
+            if cached is not None:
+                self._pattern_cache.move_to_end(key)
+        if cached is None:
+            shape_key = self._cache_key("shape:" + _message_shape(message))
+            with self._pattern_cache_lock:
+                cached = self._pattern_cache.get(shape_key)
+                if cached is not None:
+                    self._pattern_cache.move_to_end(shape_key)
+            if cached is None:
+                cached = self._pattern_diagnose(failure)
+            with self._pattern_cache_lock:
+                self._pattern_cache[shape_key] = cached
+                self._pattern_cache[key] = cached
+                while len(self._pattern_cache) > self._pattern_cache_size:
+                    self._pattern_cache.popitem(last=False)
+        # Callers get their own copy so the timestamp and fix list can be mutated safely
+        return {**cached, "suggested_fixes": list(cached["suggested_fixes"])}
+
+    @staticmethod
+    def _cache_key(text: str) -> str:
+        return hashlib.blake2b(text.encode("utf-8", "replace"), digest_size=16).hexdigest()
 
     def _pattern_diagnose(self, failure: Dict[str, Any]) -> Dict[str, Any]:
-        error = failure.get("error_message", "").lower()
-        if "schema" in error or "validation" in error:
-            return self._diagnose_schema_error(error)
-        elif "connection" in error or "timeout" in error:
-            return self._diagnose_connection_error(error)
-        elif "type" in error or "integer" in error or "string" in error:
-            return self._diagnose_type_error(error)
-        elif "missing" in error or "required" in error:
-            return self._diagnose_missing_field_error(error)
-        else:
-            return {"root_cause": "Unknown error", "suggested_fixes": ["Manual review required"], "confidence": "low"}
+        # Keywords are matched on a lowercased copy made once; extraction regexes get the original text
+        error = failure.get("error_message") or ""
+        error_lc = error.lower()
+        # Keep the highest-precedence group seen; the first group cannot be beaten
+        best = None
+        for match in _KEYWORD_RE.finditer(error_lc):
+            rank = _KEYWORD_RANK[match.group()]
+            if best is None or rank < best:
+                best = rank
+                if rank == 0:
+                    break
+        if best is None:
+            return _manual_review("Unknown error")
+        return self._pattern_handlers[best](error)
 
     def _diagnose_schema_error(self, error: str) -> Dict[str, Any]:
-        import re
-        missing = re.findall(r"missing required field '([^']+)'", error)
+        missing = _MISSING_FIELD_RE.findall(error)
         if missing:
             return {
                 "root_cause": f"Missing fields: {', '.join(missing)}",
                 "suggested_fixes": [f"Add missing field(s): {', '.join(missing)}", "Update schema"],
                 "confidence": "high"
             }
-        return {"root_cause": "Schema validation failed", "suggested_fixes": ["Review schema"], "confidence": "medium"}
+        return {"root_cause": "Schema validation failed", "suggested_fixes": list(_FIXES_REVIEW_SCHEMA), "confidence": "medium"}
 
     def _diagnose_connection_error(self, error: str) -> Dict[str, Any]:
         return {
             "root_cause": "Connection error",
-            "suggested_fixes": ["Check API/network", "Retry with backoff"],
+            "suggested_fixes": list(_FIXES_CONNECTION),
             "confidence": "medium"
         }
 
     def _diagnose_type_error(self, error: str) -> Dict[str, Any]:
         return {
             "root_cause": "Data type mismatch",
-            "suggested_fixes": ["Add type conversion", "Check data source"],
+            "suggested_fixes": list(_FIXES_TYPE_MISMATCH),
             "confidence": "high"
         }
 
     def _diagnose_missing_field_error(self, error: str) -> Dict[str, Any]:
         return {
             "root_cause": "Missing required field",
-            "suggested_fixes": ["Add missing field", "Provide default value"],
+            "suggested_fixes": list(_FIXES_MISSING_FIELD),
             "confidence": "high"
         }
\ No newline at end of file
@@ -4,10 +4,51 @@ Fix Agent (CrewAI-powered)
 Applies fixes based on diagnosis results using CrewAI agents.
 """
 
+import asyncio
+import contextlib
+import functools
+import hashlib
+import json
 import logging
+import os
+import queue
+import re
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
 from datetime import datetime
-from typing import Dict, Any, List
+from pathlib import Path
+from typing import Deque, Dict, Any, Iterable, Iterator, List, Optional, Tuple, Union
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# orjson is optional; stdlib json is used when it is not installed
+try:
+    import orjson
+
+    def _json_dumps(obj: Any, pretty: bool = False, sort_keys: bool = False) -> bytes:
+        # Non-str keys are stringified like the stdlib does, rather than raising
+        option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if pretty else 0) | (orjson.OPT_SORT_KEYS if sort_keys else 0)
+        return orjson.dumps(obj, default=str, option=option)
+
+    _json_loads = orjson.loads
+except ImportError:
+    def _json_dumps(obj: Any, pretty: bool = False, sort_keys: bool = False) -> bytes:
+        separators = None if pretty else (",", ":")
+        return json.dumps(obj, default=str, indent=2 if pretty else None, sort_keys=sort_keys,
+                          separators=separators).encode("utf-8")
+
+    _json_loads = json.loads
+
+# fcntl is POSIX-only; elsewhere approval state changes are only serialized within this process
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
 
 # CrewAI imports
 try:
@@ -19,49 +60,486 @@ except ImportError:
 
 logger = logging.getLogger(__name__)
 
+# One pooled session per process so every FixAgent reuses keep-alive connections to the backend
+_SESSION = requests.Session()
+_SESSION.headers["Content-Type"] = "application/json"
+_ADAPTER = HTTPAdapter(pool_connections=10, pool_maxsize=50,
+                       max_retries=Retry(total=2, backoff_factor=0.2, status_forcelist=[502, 503, 504]))
+_SESSION.mount("http://", _ADAPTER)
+_SESSION.mount("https://", _ADAPTER)
+
+
+# Independent backend calls (per-action fallback of a batch) are sent concurrently on these
+# threads; the width stays well under the adapter's pool so each call gets a keep-alive connection
+_FANOUT_EXECUTOR = ThreadPoolExecutor(max_workers=8, thread_name_prefix="fix-fanout")
+
+
+def get_session() -> requests.Session:
+    """Return the shared HTTP session used for backend calls."""
+    return _SESSION
+
+
+# First double-quoted span in a crew answer is taken as the chosen fix
+_QUOTED_RE = re.compile(r'"([^"]+)"')
+# Field named by a schema validation failure, patched into the data file once a fix is approved
+_MISSING_FIELD_RE = re.compile(r"Missing required field '([a-zA-Z0-9_]+)'")
+
+
+# Fix description tokens in precedence order, each mapped to the backend action that applies it
+_FIX_ACTIONS = (
+    ("schema", "update_schema"),
+    ("type conversion", "add_type_conversion"),
+    ("missing field", "add_missing_field"),
+    ("retry", "retry_task"),
+)
+_FIX_ACTION_RANK = {token: rank for rank, (token, _) in enumerate(_FIX_ACTIONS)}
+# One alternation scans the fix once instead of one `in` check per token
+_FIX_ACTION_RE = re.compile("|".join(sorted(map(re.escape, _FIX_ACTION_RANK), key=len, reverse=True)))
+
+
+@functools.lru_cache(maxsize=256)
+def _resolve_fix_action(fix: str) -> Optional[str]:
+    """Map a fix description to a backend action, or None when it must go to human approval."""
+    if not fix.strip() or "manual intervention" in fix.lower():
+        return None
+    ranks = [_FIX_ACTION_RANK[match.group()] for match in _FIX_ACTION_RE.finditer(fix)]
+    return _FIX_ACTIONS[min(ranks)][1] if ranks else None
+
+
+# Result prefixes produced by _execute_fix and _call_api, mapped to a summary status
+_RESULT_STATUSES = (
+    ("Pending human approval", "pending_approval"),
+    ("Patched missing field", "applied"),
+)
+
+
+def _result_status(result: str) -> str:
+    for prefix, status in _RESULT_STATUSES:
+        if result.startswith(prefix):
+            return status
+    if result.startswith("API call"):
+        return "failed" if " failed: " in result else "applied"
+    return "failed"
+
+
+# Files shared with the backend, resolved once per process
+_REPO_DIR = Path(__file__).resolve().parent.parent
+APPROVAL_STATE_PATH = _REPO_DIR / "backend" / "approval_state.json"
+EMPLOYEE_DATA_PATH = _REPO_DIR / "data" / "sample_employees.json"
+try:
+    APPROVAL_STATE_PATH.parent.mkdir(parents=True, exist_ok=True)
+except OSError as e:
+    logger.error("Cannot create approval state directory %s: %s", APPROVAL_STATE_PATH.parent, e)
+
+
+class _JsonFileCache:
+    """Parsed JSON files reused until their (inode, mtime_ns, size) fingerprint changes.
+
+    Writers replace files with os.replace, which always gives a new inode, so a same-size
+    rewrite inside the filesystem's mtime granularity is still noticed.
+
+    Returned objects are shared between callers; mutate them only when writing them back.
+    """
+
+    def __init__(self) -> None:
+        self._entries: Dict[Path, Tuple[Tuple[int, int, int], Any]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, path: Path) -> Any:
+        st = os.stat(path)
+        fingerprint = (st.st_ino, st.st_mtime_ns, st.st_size)
+        with self._lock:
+            entry = self._entries.get(path)
+        if entry is not None and entry[0] == fingerprint:
+            return entry[1]
+        with open(path, 'rb') as f:
+            data = _json_loads(f.read())
+        with self._lock:
+            self._entries[path] = (fingerprint, data)
+        return data
+
+    def write(self, path: Path, data: Any, pretty: bool = False) -> None:
+        """Replace the file atomically so readers never see a partial write."""
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(_json_dumps(data, pretty=pretty))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+        except BaseException:
+            with contextlib.suppress(OSError):
+                os.remove(tmp_path)
+            raise
+        finally:
+            self.invalidate(path)
+
+    def invalidate(self, path: Path) -> None:
+        with self._lock:
+            self._entries.pop(path, None)
+
+
+_json_files = _JsonFileCache()
+
+# The state file is replaced on every write, so processes lock a sidecar file instead
+APPROVAL_LOCK_PATH = APPROVAL_STATE_PATH.with_suffix(".lock")
+_approval_thread_lock = threading.Lock()
+
+
+@contextlib.contextmanager
+def _approval_state_lock() -> Iterator[None]:
+    """Hold exclusive access to approval_state.json for a read-modify-write."""
+    with _approval_thread_lock:
+        if fcntl is None:
+            yield
+            return
+        with open(APPROVAL_LOCK_PATH, 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def load_approval_state() -> Dict[str, Any]:
+    """Return the shared approval state; parsed once per change of approval_state.json.
+
+    The returned dict is shared between callers and must not be mutated.
+    """
+    try:
+        return _json_files.get(APPROVAL_STATE_PATH)
+    except (OSError, ValueError):
+        return {"pending_fix": None, "approved": False}
+
+
+def store_pending_fix(fix: str, failure: Optional[Dict[str, Any]]) -> None:
+    """Replace the shared approval state with a new, unapproved pending fix."""
+    with _approval_state_lock():
+        _json_files.write(APPROVAL_STATE_PATH, {"pending_fix": fix, "failure": failure, "approved": False})
+
+
+def approve_pending_fix() -> Dict[str, Any]:
+    """Mark the pending fix as approved and return the new state."""
+    with _approval_state_lock():
+        state = {**load_approval_state(), "approved": True}
+        _json_files.write(APPROVAL_STATE_PATH, state)
+    return state
+
+
+# (connect, read) timeouts in seconds: an unreachable backend fails fast, a slow one still gets its read budget
+CONNECT_TIMEOUT = 3.05
+SHORT_TIMEOUT = (CONNECT_TIMEOUT, 5)
+DEFAULT_TIMEOUT = (CONNECT_TIMEOUT, 10)
+
+# Consecutive endpoint failures before calls short-circuit, and the cooldown bounds in seconds
+BREAKER_FAILURE_THRESHOLD = 5
+BREAKER_BASE_COOLDOWN = 30.0
+BREAKER_MAX_COOLDOWN = 600.0
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling a backend endpoint whose circuit breaker is open."""
+
+
+@dataclass(slots=True)
+class FixRecord:
+    """History entry for a fix applied by FixAgent; mutable so queued results and rollbacks can update it."""
+    fix_id: str
+    fix: str
+    result: str
+    timestamp: str
+    timestamp_epoch: float = 0.0
+    rolled_back: bool = False
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "fix_id": self.fix_id,
+            "fix": self.fix,
+            "result": self.result,
+            "timestamp": self.timestamp,
+            "rolled_back": self.rolled_back,
+        }
+
+
 class FixAgent:
     """Applies fixes to pipeline failures using CrewAI agents."""
-    def __init__(self, flask_api_url: str = "http://localhost:5000", openai_api_key: str = None):
+    def __init__(self, flask_api_url: str = "http://localhost:5000", openai_api_key: str = None,
+                 history_path: Optional[str] = None, plan_cache_size: int = 1024, history_limit: int = 10_000):
         self.flask_api_url = flask_api_url
-        self.fix_history: List[Dict[str, Any]] = []
+        self._http = get_session()
+        self._urls = {
+            "fix_action": f"{flask_api_url}/api/fix_action",
+            "notify": f"{flask_api_url}/api/notify",
+            "batch": f"{flask_api_url}/api/apply_fixes_batch",
+            "rollback": f"{flask_api_url}/api/rollback",
+            "verify_fix": f"{flask_api_url}/api/verify_fix",
+        }
+        # Per-endpoint circuit breakers: consecutive failures and the time calls may resume
+        self._breakers: Dict[str, Dict[str, float]] = {name: {"fails": 0, "open_until": 0.0} for name in self._urls}
+        self._breaker_lock = threading.Lock()
+        # Per-thread queue of (action, failure, future) while inside buffered_fixes()
+        self._buffer = threading.local()
+        self._batch_supported = True
+        # Concurrent identical fix actions share one in-flight backend call
+        self._inflight: Dict[str, "Future[str]"] = {}
+        self._inflight_lock = threading.Lock()
+        # Bounded like the monitor and diagnosis histories; the index only holds retained records,
+        # so rollback_fix and verify_fix cannot reach a fix that has aged out
+        self.fix_history: Deque[FixRecord] = deque(maxlen=history_limit)
+        self._history_index: Dict[str, FixRecord] = {}
+        self._history_lock = threading.Lock()
+        # Rolling 24h window of (epoch, status) kept alongside running counts for get_fix_summary
+        self._recent_statuses: Deque[Tuple[float, str]] = deque()
+        self._recent_status_counts: Counter = Counter()
+        self._summary_lock = threading.Lock()
         self.openai_api_key = openai_api_key
         self.llm = ChatOpenAI(model="gpt-4", temperature=0.1, api_key=openai_api_key) if CREWAI_AVAILABLE and openai_api_key else None
-
-    def apply_fix(self, diagnosis: Dict[str, Any], failure: Dict[str, Any]) -> Dict[str, Any]:
-        """Apply a fix based on diagnosis using CrewAI."""
-        logger.info(f"Applying fix: {diagnosis}")
-        if CREWAI_AVAILABLE and self.llm:
-            fix = self._crew_plan_fix(diagnosis, failure)
-        else:
-            fix = self._choose_fix(diagnosis)
-        result = self._execute_fix(fix, failure)
-        record = {
-            "fix": fix,
-            "result": result,
-            "timestamp": datetime.now().isoformat()
-        }
-        self.fix_history.append(record)
-        return record
-
-    def _crew_plan_fix(self, diagnosis: Dict[str, Any], failure: Dict[str, Any]) -> str:
-        try:
-            # Define CrewAI agents
-            planner_agent = Agent(
+        # CrewAI agents validate and wire their LLM on construction, so build them once
+        self._crew_agents = []
+        if self.llm:
+            self._planner_agent = Agent(
                 role="Fix Planner",
                 goal="Select the safest and most effective fix for the diagnosis",
                 backstory="You are a senior engineer specializing in safe remediation.",
-                verbose=True,
+                verbose=logger.isEnabledFor(logging.DEBUG),
                 allow_delegation=False,
                 llm=self.llm
             )
-            executor_agent = Agent(
+            self._executor_agent = Agent(
                 role="Fix Executor",
                 goal="Apply the chosen fix to the pipeline",
                 backstory="You are an automation expert for data pipelines.",
-                verbose=True,
+                verbose=logger.isEnabledFor(logging.DEBUG),
                 allow_delegation=False,
                 llm=self.llm
             )
+            self._crew_agents = [self._planner_agent, self._executor_agent]
+        # Number of fixes chosen without a crew round trip, for ops visibility; counted under _summary_lock
+        self.crew_bypassed = 0
+        # LRU of crew-planned fixes keyed by (root_cause, suggested_fixes, confidence)
+        self._plan_cache: "OrderedDict[Tuple[str, Tuple[str, ...], str], str]" = OrderedDict()
+        self._plan_cache_size = plan_cache_size
+        self._plan_cache_lock = threading.Lock()
+        # Optional JSONL mirror of fix history, written by a background thread off the apply_fix path
+        history_path = history_path or os.getenv("FIX_HISTORY_PATH")
+        self._persist_queue: Optional["queue.Queue[Optional[Dict[str, Any]]]"] = None
+        if history_path:
+            self._history_path = os.path.expanduser(history_path)
+            self._persist_queue = queue.Queue(maxsize=10_000)
+            self._persist_thread = threading.Thread(target=self._persist_loop, name="fix-history-writer", daemon=True)
+            self._persist_thread.start()
+
+    def apply_fix(self, diagnosis: Dict[str, Any], failure: Dict[str, Any]) -> Dict[str, Any]:
+        """Apply a fix based on diagnosis using CrewAI."""
+        logger.debug("Applying fix: %s", diagnosis)
+        if CREWAI_AVAILABLE and self.llm and not self._crew_unneeded(diagnosis):
+            fix = self._crew_plan_fix(diagnosis, failure)
+        else:
+            fix = self._choose_fix(diagnosis)
+        result = self._execute_fix(fix, failure)
+        # One clock read serves the wire timestamp, the epoch on the record and the summary window
+        now = time.time()
+        record = FixRecord(
+            fix_id=uuid.uuid4().hex,
+            fix=fix,
+            result=result,
+            timestamp=datetime.fromtimestamp(now).isoformat(),
+            timestamp_epoch=now,
+        )
+        if isinstance(result, Future):
+            # Buffered API call: the record is filled in (and counted) when the batch is flushed
+            record.result = f"Queued: {fix}"
+            response = record.to_dict()
+
+            def _resolved(done: Future) -> None:
+                record.result = response["result"] = done.result()
+                # Counted at resolution time so the summary window stays in clock order
+                self._count_status(_result_status(record.result), time.time())
+                self._persist(record)
+
+            result.add_done_callback(_resolved)
+        else:
+            response = record.to_dict()
+            self._count_status(_result_status(result), now)
+            self._persist(record)
+        self._record(record)
+        return response
+
+    def _record(self, record: "FixRecord") -> None:
+        with self._history_lock:
+            history = self.fix_history
+            if len(history) == history.maxlen:
+                self._history_index.pop(history[0].fix_id, None)
+            history.append(record)
+            self._history_index[record.fix_id] = record
+
+    def _persist(self, record: "FixRecord") -> None:
+        if self._persist_queue is None:
+            return
+        try:
+            self._persist_queue.put_nowait(record.to_dict())
+        except queue.Full:
+            logger.warning("Fix history writer is behind; dropping record %s", record.fix_id)
+
+    def _persist_loop(self) -> None:
+        """Append queued records to the history file, up to 128 per write."""
+        try:
+            os.makedirs(os.path.dirname(self._history_path) or ".", exist_ok=True)
+        except OSError as e:
+            logger.error("Cannot create fix history directory for %s: %s", self._history_path, e)
+        stopping = False
+        while not stopping:
+            batch = [self._persist_queue.get()]
+            while len(batch) < 128:
+                try:
+                    batch.append(self._persist_queue.get(timeout=0.1))
+                except queue.Empty:
+                    break
+            if None in batch:
+                stopping = True
+                batch = [entry for entry in batch if entry is not None]
+            if not batch:
+                continue
+            try:
+                with open(self._history_path, "ab") as f:
+                    f.write(b"".join(_json_dumps(entry) + b"\n" for entry in batch))
+            except OSError as e:
+                logger.error("Failed to write fix history to %s: %s", self._history_path, e)
+
+    def close(self) -> None:
+        """Flush queued history records and stop the background writer, if one is running."""
+        if self._persist_queue is not None:
+            self._persist_queue.put(None)
+            self._persist_thread.join()
+            self._persist_queue = None
+
+    def _count_status(self, status: str, now: float) -> None:
+        with self._summary_lock:
+            self._recent_statuses.append((now, status))
+            self._recent_status_counts[status] += 1
+            self._evict_stale_statuses(now)
+
+    def _evict_stale_statuses(self, now: float) -> None:
+        cutoff = now - 86400
+        recent, counts = self._recent_statuses, self._recent_status_counts
+        while recent and recent[0][0] < cutoff:
+            _, status = recent.popleft()
+            remaining = counts.pop(status) - 1
+            if remaining:
+                counts[status] = remaining
+
+    def get_fix_summary(self) -> Dict[str, Any]:
+        """Summarize fixes applied in the last 24 hours."""
+        with self._summary_lock:
+            self._evict_stale_statuses(time.time())
+            return {
+                "total_fixes": len(self.fix_history),
+                "recent_fixes": len(self._recent_statuses),
+                "status_counts": dict(self._recent_status_counts),
+            }
+
+    def verify_fix(self, fix_id: str, max_attempts: int = 6, base_delay: float = 0.1, max_delay: float = 5.0) -> bool:
+        """Poll the backend until it confirms a fix, backing off exponentially between attempts."""
+        record = self._history_index.get(fix_id)
+        if record is None:
+            logger.warning("Verification requested for unknown fix: %s", fix_id)
+            return False
+        payload = {"fix_id": fix_id, "fix": record.fix, "timestamp": record.timestamp}
+        for attempt in range(max_attempts):
+            try:
+                response = self._post("verify_fix", payload, timeout=SHORT_TIMEOUT)
+                if response.status_code == 200 and _json_loads(response.content).get("status") == "verified":
+                    logger.info("Verified fix %s after %d attempt(s)", fix_id, attempt + 1)
+                    return True
+            except Exception as e:
+                logger.debug("Verification attempt %d for fix %s failed: %s", attempt + 1, fix_id, e)
+            if attempt + 1 < max_attempts:
+                # Exponent is capped so long polls cannot overflow the float
+                time.sleep(min(base_delay * (2 ** min(attempt, 20)), max_delay))
+        logger.error("Fix %s could not be verified after %d attempts", fix_id, max_attempts)
+        return False
+
+    def rollback_fix(self, fix_id: str) -> str:
+        """Ask the backend to roll back a previously applied fix."""
+        record = self._history_index.get(fix_id)
+        if record is None:
+            logger.warning("Rollback requested for unknown fix: %s", fix_id)
+            return f"Unknown fix: {fix_id}"
+        try:
+            payload = {"fix_id": fix_id, "fix": record.fix, "timestamp": record.timestamp}
+            response = self._post("rollback", payload, timeout=DEFAULT_TIMEOUT)
+            response.raise_for_status()
+            record.rolled_back = True
+            logger.info("Rolled back fix %s: HTTP %s", fix_id, response.status_code)
+            logger.debug("Rollback response for fix %s: %s", fix_id, response.text)
+            return f"API call 'rollback' successful: {response.text}"
+        except Exception as e:
+            logger.error("Rollback of fix %s failed: %s", fix_id, e)
+            return f"API call 'rollback' failed: {e}"
+
+    async def apply_fix_async(self, diagnosis: Dict[str, Any], failure: Dict[str, Any]) -> Dict[str, Any]:
+        """Apply a fix without blocking the event loop; the blocking work runs in a worker thread."""
+        return await asyncio.to_thread(self.apply_fix, diagnosis, failure)
+
+    async def apply_fixes(self, items: Iterable[Tuple[Dict[str, Any], Dict[str, Any]]]) -> List[Dict[str, Any]]:
+        """Apply fixes for several (diagnosis, failure) pairs concurrently, returning records in input order."""
+        return list(await asyncio.gather(*(self.apply_fix_async(diagnosis, failure) for diagnosis, failure in items)))
+
+    @contextlib.contextmanager
+    def buffered_fixes(self, flush_threshold: int = 64) -> Iterator["FixAgent"]:
+        """Queue backend fix actions made in this block and send them in batches.
+
+        Records returned by apply_fix inside the block hold a "Queued: ..." result until
+        their batch is flushed, which happens every `flush_threshold` actions and on exit.
+        """
+        self._buffer.pending = []
+        self._buffer.flush_threshold = flush_threshold
+        try:
+            yield self
+        finally:
+            try:
+                self.flush()
+            finally:
+                del self._buffer.pending
+
+    def flush(self) -> None:
+        """Send the fix actions queued by buffered_fixes() on this thread."""
+        pending = getattr(self._buffer, "pending", None)
+        if not pending:
+            return
+        batch, pending[:] = list(pending), []
+        results = self._post_fix_batch([(action, failure) for action, failure, _ in batch])
+        for (_, _, future), result in zip(batch, results):
+            future.set_result(result)
+
+    def _crew_unneeded(self, diagnosis: Dict[str, Any]) -> bool:
+        """True when the crew would only confirm the top suggestion: a single fix, or a high-confidence diagnosis."""
+        fixes = diagnosis.get("suggested_fixes", [])
+        confidence = diagnosis.get("confidence")
+        if isinstance(confidence, (int, float)) and not isinstance(confidence, bool):
+            confident = confidence >= 0.9
+        else:
+            confident = str(confidence).lower() == "high"
+        if len(fixes) == 1 or (fixes and confident):
+            with self._summary_lock:
+                self.crew_bypassed += 1
+                bypassed = self.crew_bypassed
+            logger.debug("Crew planning bypassed (%d so far)", bypassed)
+            return True
+        return False
+
+    def _crew_plan_fix(self, diagnosis: Dict[str, Any], failure: Dict[str, Any]) -> str:
+        key = (
+            str(diagnosis.get('root_cause', '')),
+            tuple(map(str, diagnosis.get('suggested_fixes', []))),
+            str(diagnosis.get('confidence', '')),
+        )
+        with self._plan_cache_lock:
+            cached = self._plan_cache.get(key)
+            if cached is not None:
+                self._plan_cache.move_to_end(key)
+                return cached
+        try:
             # Define CrewAI task
             task = Task(
                 description=f"""
@@ -71,20 +549,24 @@ class FixAgent:
                 - Confidence: {diagnosis.get('confidence', 'unknown')}
                 Choose the best fix to apply and explain why. Return a string describing the fix action.
                 """,
-                agent=planner_agent,
+                agent=self._planner_agent,
                 expected_output="A string describing the chosen fix action."
             )
-            crew = Crew(agents=[planner_agent, executor_agent], tasks=[task], verbose=True)
+            crew = Crew(agents=self._crew_agents, tasks=[task], verbose=logger.isEnabledFor(logging.DEBUG))
             result = crew.kickoff()
             # Extract the fix string from result
-            import re as _re
-            match = _re.search(r'"([^"]+)"', str(result))
-            if match:
-                return match.group(1)
-            return str(result)
+            text = result if isinstance(result, str) else str(result)
+            match = _QUOTED_RE.search(text)
+            plan = match.group(1) if match else text
         except Exception as e:
-            logger.error(f"CrewAI fix planning failed: {e}")
+            logger.error("CrewAI fix planning failed: %s", e)
+            # Not cached, so the next occurrence gets another chance at the crew
             return self._choose_fix(diagnosis)
+        with self._plan_cache_lock:
+            self._plan_cache[key] = plan
+            if len(self._plan_cache) > self._plan_cache_size:
+                self._plan_cache.popitem(last=False)
+        return plan
 
     def _choose_fix(self, diagnosis: Dict[str, Any]) -> str:
         fixes = diagnosis.get("suggested_fixes", [])
@@ -92,92 +574,160 @@ class FixAgent:
 
     def _execute_fix(self, fix: str, failure: Dict[str, Any]) -> str:
         try:
-            import os, json
-            approval_state_path = os.path.join(os.path.dirname(__file__), '../backend/approval_state.json')
-            approval_dir = os.path.dirname(approval_state_path)
-            if not os.path.exists(approval_dir):
-                os.makedirs(approval_dir, exist_ok=True)
             # Always check for any approved pending fix and apply it, regardless of current failure
             try:
-                with open(approval_state_path, 'r') as f:
-                    approval_state = json.load(f)
-                if approval_state.get("approved") and approval_state.get("pending_fix"):
-                    # Patch the data file if possible
-                    data_path = os.path.join(os.path.dirname(__file__), '../data/sample_employees.json')
-                    with open(data_path, 'r') as f:
-                        employees = json.load(f)
-                    import re
-                    # Try to extract missing field from the last failure in approval_state
-                    failure_obj = approval_state.get("failure") or failure
-                    match = re.search(r"Missing required field '([a-zA-Z0-9_]+)'", failure_obj.get("error_message", ""))
-                    if match:
-                        missing_field = match.group(1)
-                        for emp in employees:
-                            if missing_field not in emp:
-                                emp[missing_field] = f"autofix_{missing_field}@example.com" if missing_field == "email" else f"autofix_{missing_field}"
-                        with open(data_path, 'w') as f:
-                            json.dump(employees, f, indent=2)
-                        logger.info(f"Patched missing field '{missing_field}' in sample_employees.json via FixAgent after approval.")
-                    # Reset approval state
-                    with open(approval_state_path, 'w') as f:
-                        json.dump({"pending_fix": None, "failure": None, "approved": False}, f)
-                    return f"Patched missing field after approval and reset approval state."
-            except Exception as e:
-                logger.error(f"Error applying approved fix: {e}")
-            # Force human approval for certain fixes
-            if ("manual intervention" in fix.lower()) or (fix.strip().lower() == "manual intervention required") or (not fix or fix.strip() == ""):
-                try:
-                    with open(approval_state_path, 'w') as f:
-                        json.dump({"pending_fix": fix, "failure": failure, "approved": False}, f)
-                    logger.info(f"Stored pending fix for human approval: {fix}")
-                    return f"Pending human approval: {fix}"
-                except Exception as e:
-                    logger.error(f"Failed to store pending fix: {e}")
-                    return f"Failed to store pending fix: {e}"
-            # Existing logic for schema/type fixes
-            if "schema" in fix:
-                return self._call_api("update_schema", failure)
-            if "type conversion" in fix:
-                return self._call_api("add_type_conversion", failure)
-            if "missing field" in fix:
-                return self._call_api("add_missing_field", failure)
-            if "retry" in fix:
-                return self._call_api("retry_task", failure)
-            # If not handled above, always set a pending fix for human approval
-            try:
-                with open(approval_state_path, 'w') as f:
-                    json.dump({"pending_fix": fix, "failure": failure, "approved": False}, f)
-                logger.info(f"Stored pending fix for human approval: {fix}")
-                return f"Pending human approval: {fix}"
+                with _approval_state_lock():
+                    approval_state = _json_files.get(APPROVAL_STATE_PATH)
+                    if approval_state.get("approved") and approval_state.get("pending_fix"):
+                        # Patch the data file if possible
+                        # Try to extract missing field from the last failure in approval_state
+                        failure_obj = approval_state.get("failure") or failure
+                        match = _MISSING_FIELD_RE.search(failure_obj.get("error_message", ""))
+                        if match:
+                            missing_field = match.group(1)
+                            default = f"autofix_{missing_field}@example.com" if missing_field == "email" else f"autofix_{missing_field}"
+                            # Only records missing the field are copied; the cached list itself is never mutated
+                            employees = [emp if missing_field in emp else {**emp, missing_field: default}
+                                         for emp in _json_files.get(EMPLOYEE_DATA_PATH)]
+                            # Kept human-readable: the data file is tracked in the repo
+                            _json_files.write(EMPLOYEE_DATA_PATH, employees, pretty=True)
+                            logger.info("Patched missing field '%s' in sample_employees.json via FixAgent after approval.", missing_field)
+                        # Reset approval state
+                        _json_files.write(APPROVAL_STATE_PATH, {"pending_fix": None, "failure": None, "approved": False})
+                        return f"Patched missing field after approval and reset approval state."
             except Exception as e:
-                logger.error(f"Failed to store pending fix: {e}")
-                return f"Failed to store pending fix: {e}"
+                logger.error("Error applying approved fix: %s", e)
+            # Fixes the backend can apply directly; anything else needs human approval
+            action = _resolve_fix_action(fix)
+            if action is not None:
+                return self._call_api(action, failure)
+            return self._request_approval(fix, failure)
         except Exception as e:
-            logger.error(f"Fix execution failed: {e}")
+            logger.error("Fix execution failed: %s", e)
             return f"Error: {e}"
 
+    def _request_approval(self, fix: str, failure: Dict[str, Any]) -> str:
+        """Store a manual-intervention or unrecognized fix as pending for human approval."""
+        try:
+            store_pending_fix(fix, failure)
+            logger.info("Stored pending fix for human approval: %s", fix)
+            return f"Pending human approval: {fix}"
+        except Exception as e:
+            logger.error("Failed to store pending fix: %s", e)
+            return f"Failed to store pending fix: {e}"
+
+    def _post(self, endpoint: str, payload: Any, timeout: Tuple[float, float]) -> requests.Response:
+        """POST to a backend endpoint, failing fast while its circuit breaker is open."""
+        breaker = self._breakers[endpoint]
+        now = time.time()
+        if now < breaker["open_until"]:
+            raise CircuitOpenError(f"circuit open for '{endpoint}' for another {breaker['open_until'] - now:.1f}s")
+        try:
+            response = self._http.post(self._urls[endpoint], data=_json_dumps(payload), timeout=timeout)
+        except requests.RequestException:
+            self._record_endpoint_failure(endpoint)
+            raise
+        if response.status_code >= 500:
+            self._record_endpoint_failure(endpoint)
+        elif breaker["fails"]:
+            with self._breaker_lock:
+                breaker["fails"] = 0
+        return response
+
+    def _record_endpoint_failure(self, endpoint: str) -> None:
+        with self._breaker_lock:
+            breaker = self._breakers[endpoint]
+            breaker["fails"] += 1
+            overflow = breaker["fails"] - BREAKER_FAILURE_THRESHOLD
+            if overflow >= 0:
+                # Cooldown doubles with each further failure, exponent and delay both capped
+                cooldown = min(BREAKER_BASE_COOLDOWN * (2 ** min(overflow, 10)), BREAKER_MAX_COOLDOWN)
+                breaker["open_until"] = time.time() + cooldown
+                logger.warning("Opening circuit for '%s' for %.0fs after %d consecutive failures",
+                               endpoint, cooldown, breaker["fails"])
+
     def _notify_manual_intervention(self, fix: str, failure: Dict[str, Any]) -> None:
         try:
-            url = f"{self.flask_api_url}/api/notify"
             payload = {"fix": fix, "failure": failure}
-            requests.post(url, json=payload, timeout=5)
+            self._post("notify", payload, timeout=SHORT_TIMEOUT)
         except Exception as e:
-            logger.error(f"Failed to notify for manual intervention: {e}")
+            logger.error("Failed to notify for manual intervention: %s", e)
 
-    def _call_api(self, action: str, failure: Dict[str, Any]) -> str:
+    def _call_api(self, action: str, failure: Dict[str, Any]) -> Union[str, Future]:
         """
         Call the backend Flask API to perform a fix action.
+
+        Inside buffered_fixes() the call is queued and a Future for its result is returned.
         """
-        import requests
-        import os
-        import json
+        pending = getattr(self._buffer, "pending", None)
+        if pending is not None:
+            future: Future = Future()
+            pending.append((action, failure, future))
+            if len(pending) >= self._buffer.flush_threshold:
+                self.flush()
+            return future
+        return self._single_flight_fix_action(action, failure)
+
+    def _single_flight_fix_action(self, action: str, failure: Dict[str, Any]) -> str:
+        """Post a fix action, letting concurrent identical requests share one backend call."""
+        try:
+            body = _json_dumps(failure, sort_keys=True)
+        except TypeError:
+            # Stdlib json cannot sort mixed str/int keys; an unsorted key only shares less often
+            body = _json_dumps(failure)
+        key = f"{action}:{hashlib.blake2b(body, digest_size=16).hexdigest()}"
+        with self._inflight_lock:
+            future = self._inflight.get(key)
+            is_owner = future is None
+            if is_owner:
+                future = Future()
+                self._inflight[key] = future
+        if not is_owner:
+            return future.result()
+        try:
+            result = self._post_fix_action(action, failure)
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._inflight_lock:
+                self._inflight.pop(key, None)
+
+    def _post_fix_action(self, action: str, failure: Dict[str, Any]) -> str:
         try:
-            url = f"{self.flask_api_url}/api/fix_action"
             payload = {"action": action, "failure": failure}
-            response = requests.post(url, json=payload, timeout=10)
+            response = self._post("fix_action", payload, timeout=DEFAULT_TIMEOUT)
             response.raise_for_status()
-            logger.info(f"Called backend API for action '{action}': {response.text}")
+            logger.debug("Called backend API for action '%s': HTTP %s", action, response.status_code)
+            logger.debug("Backend response for action '%s': %s", action, response.text)
             return f"API call '{action}' successful: {response.text}"
         except Exception as e:
-            logger.error(f"API call '{action}' failed: {e}")
-            return f"API call '{action}' failed: {e}"
\ No newline at end of file
+            logger.error("API call '%s' failed: %s", action, e)
+            return f"API call '{action}' failed: {e}"
+
+    def _post_fix_batch(self, items: List[Tuple[str, Dict[str, Any]]]) -> List[str]:
+        """POST several fix actions at once, falling back to one call each if batching is unavailable."""
+        if self._batch_supported:
+            try:
+                payload = [{"action": action, "failure": failure} for action, failure in items]
+                response = self._post("batch", payload, timeout=DEFAULT_TIMEOUT)
+                if response.status_code == 404:
+                    # Older backend without the batch endpoint; remember and stop trying
+                    self._batch_supported = False
+                else:
+                    response.raise_for_status()
+                    results = _json_loads(response.content).get("results", [])
+                    if len(results) != len(items):
+                        raise ValueError(f"expected {len(items)} results, got {len(results)}")
+                    logger.info("Called backend batch API for %d actions", len(items))
+                    return [f"API call '{action}' successful: {_json_dumps(item).decode()}"
+                            for (action, _), item in zip(items, results)]
+            except Exception as e:
+                logger.error("Batch API call for %d actions failed: %s", len(items), e)
+                return [f"API call '{action}' failed: {e}" for action, _ in items]
+        if len(items) == 1:
+            return [self._post_fix_action(*items[0])]
+        # Results come back in input order, one per queued future
+        return list(_FANOUT_EXECUTOR.map(lambda item: self._post_fix_action(*item), items))
@@ -4,10 +4,36 @@ Monitor Agent (CrewAI-powered)
 Detects pipeline failures, analyzes severity, and triggers diagnosis using CrewAI agents.
 """
 
+import asyncio
+import copy
+import functools
+import itertools
+import json
 import logging
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future
 from datetime import datetime, timedelta
-from typing import Dict, Any, List
+from typing import Deque, Dict, Any, Iterable, List, Optional, Tuple
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# orjson is optional; stdlib json is used when it is not installed
+try:
+    import orjson
+
+    def _json_dumps(obj: Any, sort_keys: bool = False) -> bytes:
+        # Non-str keys are stringified like the stdlib does, rather than raising
+        return orjson.dumps(obj, default=str, option=orjson.OPT_NON_STR_KEYS | (orjson.OPT_SORT_KEYS if sort_keys else 0))
+
+    _json_loads = orjson.loads
+except ImportError:
+    def _json_dumps(obj: Any, sort_keys: bool = False) -> bytes:
+        return json.dumps(obj, default=str, sort_keys=sort_keys, separators=(",", ":")).encode("utf-8")
+
+    _json_loads = json.loads
 
 # CrewAI imports
 try:
@@ -19,37 +45,189 @@ except ImportError:
 
 logger = logging.getLogger(__name__)
 
+# One pooled session per process so diagnosis triggers reuse keep-alive connections to the backend
+_SESSION = requests.Session()
+_ADAPTER = HTTPAdapter(pool_connections=10, pool_maxsize=50,
+                       max_retries=Retry(total=2, backoff_factor=0.2, status_forcelist=[502, 503, 504]))
+_SESSION.mount("http://", _ADAPTER)
+_SESSION.mount("https://", _ADAPTER)
+
+
+_JSON_HEADERS = {"Content-Type": "application/json"}
+
+# (connect, read) timeout in seconds for the fallback diagnosis call
+DIAGNOSE_TIMEOUT = (3.05, 30)
+
+
+def get_session() -> requests.Session:
+    """Return the shared HTTP session used for backend calls."""
+    return _SESSION
+
+
+@functools.lru_cache(maxsize=256)
+def _dump_history(items: Tuple[Tuple[Tuple[str, Any], ...], ...]) -> str:
+    return _json_dumps([dict(item) for item in items], sort_keys=True).decode()
+
+
+def _history_json(history: List[Dict[str, Any]]) -> str:
+    """Compact, key-sorted JSON for prompt history; identical windows are serialized once."""
+    try:
+        return _dump_history(tuple(tuple(sorted(event.items())) for event in history))
+    except TypeError:
+        # Unhashable values (lists/dicts from the webhook payload) cannot be memoized
+        return _json_dumps(history, sort_keys=True).decode()
+
+
+def _event_epoch(timestamp: Any) -> float:
+    """Epoch seconds for an event timestamp, parsed once; unparseable values count as now."""
+    try:
+        return datetime.fromisoformat(timestamp).timestamp()
+    except (TypeError, ValueError):
+        return time.time()
+
+
 class MonitorAgent:
     """Monitors pipeline failures and triggers diagnosis using CrewAI agents."""
-    def __init__(self, api_base_url: str = "http://localhost:5000", openai_api_key: str = None):
+    def __init__(self, api_base_url: str = "http://localhost:5000", openai_api_key: str = None,
+                 dedupe_ttl: float = 30.0, dedupe_size: int = 4096, history_limit: int = 10_000):
         self.api_base_url = api_base_url
-        self.failure_history: List[Dict[str, Any]] = []
+        # Oldest events fall off once history_limit is reached
+        self.failure_history: Deque[Dict[str, Any]] = deque(maxlen=history_limit)
+        self._next_eviction = 0.0
+        # Per-task (epoch, event) entries in arrival order; stale heads are dropped lazily and
+        # a task's key goes once its deque is empty
+        self._by_task: Dict[str, Deque[Tuple[float, Dict[str, Any]]]] = {}
+        # Events per (dag_id, task_id), oldest first; mark_failure_resolved targets the oldest one
+        self._by_key: Dict[Tuple[str, str], Deque[Dict[str, Any]]] = {}
+        # Guards failure_history, _by_key and _by_task; webhooks arrive on several request threads
+        self._history_lock = threading.Lock()
+        # Recently seen webhook keys -> arrival epoch, oldest first; repeats within dedupe_ttl are suppressed
+        self._seen: "OrderedDict[Tuple[Any, ...], float]" = OrderedDict()
+        self._seen_lock = threading.Lock()
+        self.dedupe_ttl = dedupe_ttl
+        self.dedupe_size = dedupe_size
+        # Diagnoses already running for a (dag_id, task_id, error_type, error_message); concurrent
+        # events with the same failure wait and share the result
+        self._inflight: Dict[Tuple[Any, ...], "Future[Any]"] = {}
+        self._inflight_lock = threading.Lock()
         self.alert_threshold = 3  # consecutive failures
         self.time_window = timedelta(hours=1)
         self.openai_api_key = openai_api_key
         self.llm = ChatOpenAI(model="gpt-4", temperature=0.1, api_key=openai_api_key) if CREWAI_AVAILABLE and openai_api_key else None
+        # CrewAI agents validate and wire their LLM on construction, so build them once
+        self._crew_agents = []
+        if self.llm:
+            self._monitor_agent = Agent(
+                role="Failure Monitor",
+                goal="Detect and summarize pipeline failures",
+                backstory="You monitor data pipelines and escalate issues for diagnosis.",
+                verbose=logger.isEnabledFor(logging.DEBUG),
+                allow_delegation=False,
+                llm=self.llm
+            )
+            self._diagnosis_agent = Agent(
+                role="Diagnosis Specialist",
+                goal="Analyze failure events and recommend next steps",
+                backstory="You are an expert in diagnosing pipeline failures.",
+                verbose=logger.isEnabledFor(logging.DEBUG),
+                allow_delegation=False,
+                llm=self.llm
+            )
+            self._crew_agents = [self._monitor_agent, self._diagnosis_agent]
 
     def process_webhook(self, webhook_data: Dict[str, Any]) -> Dict[str, Any]:
         """Process incoming webhook data from failed pipeline tasks using CrewAI."""
-        logger.info(f"Processing webhook: {webhook_data}")
-        event = self._create_failure_event(webhook_data)
-        self.failure_history.append(event)
-        if self._should_intervene(event):
+        logger.debug("Processing webhook: %s", webhook_data)
+        # One clock read per webhook: the default event timestamp and the intervention window share it
+        now = time.time()
+        if now >= self._next_eviction:
+            self._evict_expired(now)
+        if self.is_recent_duplicate(webhook_data, now):
+            logger.info("Suppressed duplicate webhook for %s.%s", webhook_data.get("dag_id"), webhook_data.get("task_id"))
+            return {"status": "duplicate_suppressed"}
+        now_iso = datetime.fromtimestamp(now).isoformat()
+        event = self._create_failure_event(webhook_data, now_iso)
+        event_ts = now if event["timestamp"] is now_iso else _event_epoch(event["timestamp"])
+        self._record_event(event, event_ts)
+        if self._should_intervene(event, now):
             diagnosis = self._crew_trigger_diagnosis(event)
             return {"status": "intervention_triggered", "diagnosis": diagnosis}
         return {"status": "monitored"}
 
-    def _create_failure_event(self, data: Dict[str, Any]) -> Dict[str, Any]:
+    def _record_event(self, event: Dict[str, Any], event_ts: float) -> None:
+        """Append to the bounded history and the per-task indexes, dropping the evicted event."""
+        with self._history_lock:
+            history = self.failure_history
+            if len(history) == history.maxlen:
+                evicted = history[0]
+                key = (evicted["dag_id"], evicted["task_id"])
+                events = self._by_key[key]
+                # History is in arrival order, so the evicted event is the oldest of its task
+                events.popleft()
+                if not events:
+                    del self._by_key[key]
+            history.append(event)
+            self._by_key.setdefault((event["dag_id"], event["task_id"]), deque()).append(event)
+            self._by_task.setdefault(event["task_id"], deque()).append((event_ts, event))
+
+    def _recent_history(self, count: int) -> List[Dict[str, Any]]:
+        """The last `count` events, oldest first, without copying the whole history."""
+        with self._history_lock:
+            return list(itertools.islice(reversed(self.failure_history), count))[::-1]
+
+    def _evict_expired(self, now: float) -> None:
+        """Drop per-task entries older than the intervention window; runs at most once a minute."""
+        cutoff = now - self.time_window.total_seconds()
+        with self._history_lock:
+            by_task = self._by_task
+            for task_id, entries in list(by_task.items()):
+                while entries and entries[0][0] <= cutoff:
+                    entries.popleft()
+                if not entries:
+                    del by_task[task_id]
+        self._next_eviction = now + 60
+
+    def is_recent_duplicate(self, webhook_data: Any, now: Optional[float] = None) -> bool:
+        """Record this webhook and report whether an identical one arrived within dedupe_ttl seconds.
+
+        Airflow retries re-send the same dag_id/task_id/execution_date/error; only the first is processed.
+        """
+        if self.dedupe_ttl <= 0 or not isinstance(webhook_data, dict):
+            return False
+        key = tuple(str(webhook_data.get(field, "")) for field in ("dag_id", "task_id", "execution_date", "error_type", "error_message"))
+        now = time.time() if now is None else now
+        with self._seen_lock:
+            seen = self._seen
+            # Entries are in arrival order, so expired ones are all at the front
+            while seen:
+                oldest_key, oldest_ts = next(iter(seen.items()))
+                if now - oldest_ts < self.dedupe_ttl and len(seen) < self.dedupe_size:
+                    break
+                del seen[oldest_key]
+            if key in seen:
+                return True
+            seen[key] = now
+            return False
+
+    async def aprocess_webhook(self, webhook_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Process a webhook without blocking the event loop; the crew or API call runs in a worker thread."""
+        return await asyncio.to_thread(self.process_webhook, webhook_data)
+
+    async def process_webhooks_batch(self, events: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Process several webhooks concurrently, returning results in input order."""
+        return list(await asyncio.gather(*(self.aprocess_webhook(event) for event in events)))
+
+    def _create_failure_event(self, data: Dict[str, Any], now_iso: Optional[str] = None) -> Dict[str, Any]:
         # Defensive: ensure data is a dict before using .get
         if not isinstance(data, dict):
-            logger.error(f"Expected dict for failure event, got {type(data)}: {data}")
+            logger.error("Expected dict for failure event, got %s: %s", type(data), data)
             return {
                 "dag_id": "unknown",
                 "task_id": "unknown",
                 "execution_date": "",
                 "error_message": str(data),
                 "error_type": "unknown",
-                "timestamp": datetime.now().isoformat(),
+                "timestamp": now_iso or datetime.now().isoformat(),
                 "resolved": False,
             }
         return {
@@ -58,36 +236,57 @@ class MonitorAgent:
             "execution_date": data.get("execution_date", ""),
             "error_message": data.get("error_message", ""),
             "error_type": data.get("error_type", "unknown"),
-            "timestamp": data.get("timestamp", datetime.now().isoformat()),
+            "timestamp": data["timestamp"] if "timestamp" in data else (now_iso or datetime.now().isoformat()),
             "resolved": False,
         }
 
-    def _should_intervene(self, event: Dict[str, Any]) -> bool:
-        recent = [f for f in self.failure_history if f["task_id"] == event["task_id"] and not f["resolved"]
-                  and datetime.fromisoformat(f["timestamp"]) > datetime.now() - self.time_window]
-        return len(recent) >= self.alert_threshold or event["error_type"] in ("schema_validation", "connection_error")
+    def _should_intervene(self, event: Dict[str, Any], now: Optional[float] = None) -> bool:
+        cutoff = (time.time() if now is None else now) - self.time_window.total_seconds()
+        task_id = event["task_id"]
+        with self._history_lock:
+            entries = self._by_task.get(task_id)
+            recent = 0
+            if entries is not None:
+                # The cutoff only moves forward, so an entry older than it can never count again
+                while entries and entries[0][0] <= cutoff:
+                    entries.popleft()
+                if entries:
+                    recent = sum(1 for ts, f in entries if ts > cutoff and not f["resolved"])
+                else:
+                    del self._by_task[task_id]
+        return recent >= self.alert_threshold or event["error_type"] in ("schema_validation", "connection_error")
 
     def _crew_trigger_diagnosis(self, event: Dict[str, Any]) -> Any:
+        """Trigger a diagnosis, coalescing concurrent events for the same task failure into one call.
+
+        Events only share a diagnosis when everything it depends on matches; a different
+        error on the same task gets its own call.
+        """
+        key = (event["dag_id"], event["task_id"], event["error_type"], str(event["error_message"]))
+        with self._inflight_lock:
+            future = self._inflight.get(key)
+            is_owner = future is None
+            if is_owner:
+                future = Future()
+                self._inflight[key] = future
+        if not is_owner:
+            logger.info("Reusing in-flight diagnosis for %s.%s", event["dag_id"], event["task_id"])
+            return copy.deepcopy(future.result())
+        try:
+            result = self._run_trigger_diagnosis(event)
+            future.set_result(result)
+            return copy.deepcopy(result)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._inflight_lock:
+                self._inflight.pop(key, None)
+
+    def _run_trigger_diagnosis(self, event: Dict[str, Any]) -> Any:
         if not (CREWAI_AVAILABLE and self.llm):
             return self._fallback_trigger_diagnosis(event)
         try:
-            # Define CrewAI agents
-            monitor_agent = Agent(
-                role="Failure Monitor",
-                goal="Detect and summarize pipeline failures",
-                backstory="You monitor data pipelines and escalate issues for diagnosis.",
-                verbose=True,
-                allow_delegation=False,
-                llm=self.llm
-            )
-            diagnosis_agent = Agent(
-                role="Diagnosis Specialist",
-                goal="Analyze failure events and recommend next steps",
-                backstory="You are an expert in diagnosing pipeline failures.",
-                verbose=True,
-                allow_delegation=False,
-                llm=self.llm
-            )
             # Define CrewAI task
             task = Task(
                 description=f"""
@@ -97,35 +296,37 @@ class MonitorAgent:
                 - Error: {event['error_message']}
                 - Type: {event['error_type']}
                 - Time: {event['timestamp']}
-                Recent history: {self.failure_history[-5:]}
+                Recent history: {_history_json(self._recent_history(5))}
                 Please summarize the failure and recommend if diagnosis should be triggered, and what info to send.
                 """,
-                agent=monitor_agent,
+                agent=self._monitor_agent,
                 expected_output="A JSON object with: summary, should_diagnose (bool), and recommended_info (dict)"
             )
-            crew = Crew(agents=[monitor_agent, diagnosis_agent], tasks=[task], verbose=True)
+            crew = Crew(agents=self._crew_agents, tasks=[task], verbose=logger.isEnabledFor(logging.DEBUG))
             result = crew.kickoff()
             return result
         except Exception as e:
-            logger.error(f"CrewAI diagnosis trigger failed: {e}")
+            logger.error("CrewAI diagnosis trigger failed: %s", e)
             return {"error": str(e)}
 
     def _fallback_trigger_diagnosis(self, event: Dict[str, Any]) -> Any:
         # Fallback to API call if CrewAI is not available
         try:
             url = f"{self.api_base_url}/api/diagnose"
-            payload = {"failure_event": event, "history": self.failure_history[-10:]}
-            # Increase timeout to 30 seconds for Docker backend
-            resp = requests.post(url, json=payload, timeout=30)
+            payload = {"failure_event": event, "history": self._recent_history(10)}
+            # Connecting should be quick; the 30 second read budget covers a diagnosis on the Docker backend
+            resp = get_session().post(url, data=_json_dumps(payload), headers=_JSON_HEADERS, timeout=DIAGNOSE_TIMEOUT)
             resp.raise_for_status()
-            return resp.json()
+            return _json_loads(resp.content)
         except Exception as e:
-            logger.error(f"Diagnosis trigger failed: {e}")
+            logger.error("Diagnosis trigger failed: %s", e)
             return {"error": str(e)}
 
     def mark_failure_resolved(self, dag_id: str, task_id: str) -> bool:
-        for f in self.failure_history:
-            if f["dag_id"] == dag_id and f["task_id"] == task_id:
-                f["resolved"] = True
-                return True
-        return False
\ No newline at end of file
+        """Mark the oldest recorded event for this DAG task as resolved."""
+        with self._history_lock:
+            events = self._by_key.get((dag_id, task_id))
+            if not events:
+                return False
+            events[0]["resolved"] = True
+            return True
\ No newline at end of file
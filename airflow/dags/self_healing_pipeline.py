@@ -11,10 +11,15 @@ This DAG demonstrates an AI-powered self-healing data pipeline that:
 
 import json
 import logging
+import os
+import re
 import requests
+import numpy as np
 import pandas as pd
 from datetime import datetime, timedelta
 from typing import Dict, Any, List
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 from airflow import DAG
 from airflow.operators.python import PythonOperator
@@ -49,6 +54,88 @@ EXPECTED_SCHEMA = {
     },
     "required": ["id", "name", "email", "department", "salary", "hire_date"]
 }
+_REQUIRED = frozenset(EXPECTED_SCHEMA['required'])
+
+# fastjsonschema is optional; it compiles the schema to plain Python for a fast accept of clean shards.
+# The compiled schema is stricter than the checks reported on, so a rejection only means
+# the shard goes through the column-wise checks that produce the error messages.
+try:
+    import fastjsonschema
+    _validate_shard = fastjsonschema.compile({"type": "array", "items": EXPECTED_SCHEMA})
+except ImportError:
+    _validate_shard = None
+
+# orjson is optional; load_data falls back to stdlib json when it is not installed
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# pyarrow is optional; with it transformed shards are handed to load_data as Parquet, without it
+# (or for values Arrow cannot type) they are handed off as JSON
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+# Shards below this many rows are transformed record by record, where building a DataFrame costs more than it saves
+SMALL_SHARD_ROWS = 10_000
+
+# Shared keep-alive session for backend calls; GET is retried on transient errors, the webhook POST is not
+_SESSION = requests.Session()
+_ADAPTER = HTTPAdapter(pool_connections=10, pool_maxsize=16,
+                       max_retries=Retry(total=3, backoff_factor=0.2, status_forcelist=[502, 503, 504]))
+_SESSION.mount("http://", _ADAPTER)
+_SESSION.mount("https://", _ADAPTER)
+
+# Task payloads are handed off through files here; XCom only carries their paths
+HANDOFF_DIR = os.environ.get("PIPELINE_HANDOFF_DIR", "/tmp/self_healing_pipeline")
+
+# Records per shard; each shard is validated and transformed by its own mapped task instance
+SHARD_SIZE = int(os.environ.get("PIPELINE_SHARD_SIZE", "500"))
+
+def _handoff_path(context: Dict[str, Any], name: str) -> str:
+    """
+    Per-run file path for an intermediate task payload
+    """
+    run_id = re.sub(r'[^A-Za-z0-9_.-]', '_', context['run_id'])
+    return os.path.join(HANDOFF_DIR, f"{run_id}_{name}")
+
+def _load_shard(shard_uri: str) -> List[Dict[str, Any]]:
+    with open(shard_uri, 'rb') as f:
+        return json.load(f)
+
+def _write_json(path: str, records: List[Dict[str, Any]]) -> None:
+    if orjson is not None:
+        payload = orjson.dumps(records, default=str, option=orjson.OPT_SERIALIZE_NUMPY)
+    else:
+        payload = json.dumps(records, default=str, separators=(',', ':')).encode('utf-8')
+    with open(path, 'wb') as f:
+        f.write(payload)
+
+def _write_transformed_frame(context: Dict[str, Any], offset: int, df: pd.DataFrame) -> str:
+    """
+    Write a transformed shard as Parquet, or as JSON when no Parquet engine is installed
+    or Arrow cannot type a column (e.g. an extra field holding both str and int)
+    """
+    if pa is not None:
+        transformed_uri = _handoff_path(context, f'transformed_{offset}.parquet')
+        try:
+            df.to_parquet(transformed_uri, index=False, engine='pyarrow')
+            return transformed_uri
+        except (pa.ArrowException, TypeError, ValueError) as e:
+            logger.info(f"Shard at offset {offset} is not Arrow-typable, handing it off as JSON: {e}")
+            if os.path.exists(transformed_uri):
+                os.remove(transformed_uri)
+    transformed_uri = _handoff_path(context, f'transformed_{offset}.json')
+    _write_json(transformed_uri, df.to_dict('records'))
+    return transformed_uri
+
+def _read_transformed(uri: str) -> pd.DataFrame:
+    if uri.endswith('.parquet'):
+        return pd.read_parquet(uri)
+    return pd.DataFrame(_load_shard(uri))
 
 def fetch_api_data(**context) -> Dict[str, Any]:
     """
@@ -57,14 +144,22 @@ def fetch_api_data(**context) -> Dict[str, Any]:
     try:
         # Simulate API call to get employee data
         api_url = "http://backend:5000/api/employees"
-        response = requests.get(api_url, timeout=30)
+        response = _SESSION.get(api_url, timeout=30)
         response.raise_for_status()
         
         data = response.json()
         logger.info(f"Successfully fetched {len(data)} records from API")
         
-        # Store data in XCom for next task
-        context['task_instance'].xcom_push(key='raw_data', value=data)
+        # Raw records stay JSON so validation sees them exactly as served.
+        # An empty response still gets one shard so validation reports it.
+        os.makedirs(HANDOFF_DIR, exist_ok=True)
+        shards = []
+        for offset in range(0, max(len(data), 1), SHARD_SIZE):
+            shard_uri = _handoff_path(context, f'raw_{offset}.json')
+            with open(shard_uri, 'w') as f:
+                json.dump(data[offset:offset + SHARD_SIZE], f)
+            shards.append({'shard_uri': shard_uri, 'offset': offset})
+        context['task_instance'].xcom_push(key='shards', value=shards)
         
         return {
             'status': 'success',
@@ -76,31 +171,78 @@ def fetch_api_data(**context) -> Dict[str, Any]:
         logger.error(f"Failed to fetch API data: {str(e)}")
         raise
 
-def validate_schema(**context) -> Dict[str, Any]:
+def _is_int(value: Any) -> bool:
+    return isinstance(value, int)
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float))
+
+def _record_errors(i: int, record: Dict[str, Any]) -> List[str]:
+    """
+    Schema errors for a single record, in reporting order
+    """
+    errors = []
+    # Check if all required fields are present; one set difference, then report in schema order
+    missing = _REQUIRED.difference(record)
+    if missing:
+        errors.extend(f"Record {i}: Missing required field '{field}'"
+                      for field in EXPECTED_SCHEMA['required'] if field in missing)
+    
+    # Check data types
+    if 'id' in record and not isinstance(record['id'], int):
+        errors.append(f"Record {i}: 'id' must be integer, got {type(record['id'])}")
+    
+    if 'salary' in record and not isinstance(record['salary'], (int, float)):
+        errors.append(f"Record {i}: 'salary' must be number, got {type(record['salary'])}")
+    return errors
+
+def _shard_conforms(raw_data: List[Dict[str, Any]]) -> bool:
     """
-    Validate the schema of incoming data
+    Fast accept: True only if every record passes the compiled schema
+    """
+    if _validate_shard is None:
+        return False
+    try:
+        _validate_shard(raw_data)
+    except fastjsonschema.JsonSchemaException:
+        return False
+    # JSON Schema counts 1.0 as an integer; the reported 'id' check does not
+    return not any(isinstance(record['id'], float) for record in raw_data)
+
+def _schema_errors(raw_data: List[Dict[str, Any]], offset: int) -> List[str]:
+    """
+    Schema errors for a shard whose first record is number `offset`
+    """
+    df = pd.DataFrame(raw_data)
+    required = EXPECTED_SCHEMA['required']
+    
+    # Column-wise checks flag suspect rows; only those are re-checked record by record
+    if not _REQUIRED.issubset(df.columns):
+        suspect = np.ones(len(df), dtype=bool)
+    else:
+        suspect = df[required].isna().any(axis=1).to_numpy()
+        if not pd.api.types.is_integer_dtype(df['id']):
+            suspect = suspect | ~df['id'].map(_is_int).to_numpy(dtype=bool)
+        if not pd.api.types.is_numeric_dtype(df['salary']) or pd.api.types.is_bool_dtype(df['salary']):
+            suspect = suspect | ~df['salary'].map(_is_number).to_numpy(dtype=bool)
+    
+    validation_errors = []
+    for i in np.flatnonzero(suspect):
+        validation_errors.extend(_record_errors(offset + int(i), raw_data[i]))
+    return validation_errors
+
+def validate_schema(shard_uri: str, offset: int = 0, **context) -> Dict[str, Any]:
+    """
+    Validate the schema of one shard of incoming data
     """
     try:
         # Get data from previous task
-        raw_data = context['task_instance'].xcom_pull(task_ids='fetch_api_data', key='raw_data')
+        raw_data = _load_shard(shard_uri)
         
         if not raw_data:
             raise ValueError("No data received from previous task")
         
-        validation_errors = []
-        
-        for i, record in enumerate(raw_data):
-            # Check if all required fields are present
-            for field in EXPECTED_SCHEMA['required']:
-                if field not in record:
-                    validation_errors.append(f"Record {i}: Missing required field '{field}'")
-            
-            # Check data types
-            if 'id' in record and not isinstance(record['id'], int):
-                validation_errors.append(f"Record {i}: 'id' must be integer, got {type(record['id'])}")
-            
-            if 'salary' in record and not isinstance(record['salary'], (int, float)):
-                validation_errors.append(f"Record {i}: 'salary' must be number, got {type(record['salary'])}")
+        validation_errors = [] if _shard_conforms(raw_data) else _schema_errors(raw_data, offset)
         
         if validation_errors:
             error_msg = f"Schema validation failed: {'; '.join(validation_errors)}"
@@ -123,33 +265,76 @@ def validate_schema(**context) -> Dict[str, Any]:
         logger.error(f"Schema validation failed: {str(e)}")
         raise
 
-def transform_data(**context) -> Dict[str, Any]:
+def _transform_small(raw_data: List[Dict[str, Any]], processed_at: str) -> Any:
     """
-    Transform the validated data
+    Transform a small shard record by record, without pandas; returns the transformed
+    records, or None if the shard needs the DataFrame path (uneven keys or values it cannot take)
     """
+    if len(raw_data) >= SMALL_SHARD_ROWS:
+        return None
+    keys = raw_data[0].keys()
+    if any(record.keys() != keys for record in raw_data):
+        return None
     try:
-        raw_data = context['task_instance'].xcom_pull(task_ids='fetch_api_data', key='raw_data')
-        
-        # Convert to DataFrame for easier transformation
-        df = pd.DataFrame(raw_data)
-        
-        # Apply transformations
-        df['full_name'] = df['name'].str.upper()
-        df['department_upper'] = df['department'].str.upper()
-        df['salary_formatted'] = df['salary'].apply(lambda x: f"${x:,.2f}")
-        df['processed_at'] = datetime.now().isoformat()
-        
-        # Convert back to list of dicts
-        transformed_data = df.to_dict('records')
+        return [
+            {**record,
+             'full_name': record['name'].upper(),
+             'department_upper': record['department'].upper(),
+             'salary_formatted': f"${record['salary']:,.2f}",
+             'processed_at': processed_at}
+            for record in raw_data
+        ]
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+def _write_transformed_records(context: Dict[str, Any], offset: int, records: List[Dict[str, Any]]) -> str:
+    """
+    Write transformed records as Parquet through a pyarrow Table, or as JSON when
+    pyarrow is missing or cannot type them
+    """
+    if pa is not None:
+        try:
+            table = pa.Table.from_pylist(records)
+        except (pa.ArrowException, TypeError, ValueError) as e:
+            logger.info(f"Shard at offset {offset} is not Arrow-typable, handing it off as JSON: {e}")
+        else:
+            transformed_uri = _handoff_path(context, f'transformed_{offset}.parquet')
+            pq.write_table(table, transformed_uri)
+            return transformed_uri
+    transformed_uri = _handoff_path(context, f'transformed_{offset}.json')
+    _write_json(transformed_uri, records)
+    return transformed_uri
+
+def transform_data(shard_uri: str, offset: int = 0, **context) -> Dict[str, Any]:
+    """
+    Transform one shard of the validated data
+    """
+    try:
+        raw_data = _load_shard(shard_uri)
+        processed_at = datetime.now().isoformat()
         
-        # Store transformed data
-        context['task_instance'].xcom_push(key='transformed_data', value=transformed_data)
+        # Shards go to load_data as columnar Parquet where pyarrow can take them, JSON otherwise
+        records = _transform_small(raw_data, processed_at)
+        if records is not None:
+            transformed_uri = _write_transformed_records(context, offset, records)
+        else:
+            # Convert to DataFrame for easier transformation
+            df = pd.DataFrame(raw_data)
+            
+            # Apply transformations
+            df['full_name'] = df['name'].str.upper()
+            df['department_upper'] = df['department'].str.upper()
+            # Bound str.format avoids a Python lambda frame per row
+            df['salary_formatted'] = df['salary'].map("${:,.2f}".format)
+            df['processed_at'] = processed_at
+            transformed_uri = _write_transformed_frame(context, offset, df)
+        context['task_instance'].xcom_push(key='transformed_uri', value=transformed_uri)
         
-        logger.info(f"Successfully transformed {len(transformed_data)} records")
+        logger.info(f"Successfully transformed {len(raw_data)} records")
         
         return {
             'status': 'success',
-            'transformed_records': len(transformed_data),
+            'transformed_records': len(raw_data),
             'timestamp': datetime.now().isoformat()
         }
         
@@ -162,15 +347,24 @@ def load_data(**context) -> Dict[str, Any]:
     Load transformed data to target system
     """
     try:
-        transformed_data = context['task_instance'].xcom_pull(task_ids='transform_data', key='transformed_data')
+        # Pulling from the mapped task yields every shard's path, in shard order
+        transformed_uris = list(context['task_instance'].xcom_pull(task_ids='transform_data', key='transformed_uri'))
+        transformed_data = pd.concat([_read_transformed(uri) for uri in transformed_uris],
+                                     ignore_index=True).to_dict('records')
         
         # Simulate loading to database/file system
         # In real implementation, this would connect to actual target system
         
         # Save to JSON file for demo purposes
         output_file = f"/tmp/processed_data_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-        with open(output_file, 'w') as f:
-            json.dump(transformed_data, f, indent=2)
+        # Compact, written in one call: the output is read by programs, not people
+        _write_json(output_file, transformed_data)
+        
+        # Intermediate payloads are no longer needed once the run's output is written
+        shards = context['task_instance'].xcom_pull(task_ids='fetch_api_data', key='shards') or []
+        for path in [shard['shard_uri'] for shard in shards] + transformed_uris:
+            if os.path.exists(path):
+                os.remove(path)
         
         logger.info(f"Successfully loaded {len(transformed_data)} records to {output_file}")
         
@@ -201,7 +395,7 @@ def trigger_ai_webhook(error_message: str, context: Dict[str, Any]) -> None:
             'timestamp': datetime.now().isoformat()
         }
         
-        response = requests.post(webhook_url, json=payload, timeout=60)
+        response = _SESSION.post(webhook_url, json=payload, timeout=60)
         response.raise_for_status()
         
         logger.info(f"Successfully triggered AI webhook: {response.status_code}")
@@ -241,17 +435,18 @@ fetch_task = PythonOperator(
     dag=dag
 )
 
-validate_task = PythonOperator(
+# One mapped task instance per shard pushed by fetch_api_data, so shards run in parallel
+validate_task = PythonOperator.partial(
     task_id='validate_schema',
     python_callable=validate_schema,
     dag=dag
-)
+).expand(op_kwargs=fetch_task.output['shards'])
 
-transform_task = PythonOperator(
+transform_task = PythonOperator.partial(
     task_id='transform_data',
     python_callable=transform_data,
     dag=dag
-)
+).expand(op_kwargs=fetch_task.output['shards'])
 
 load_task = PythonOperator(
     task_id='load_data',
@@ -1,244 +1,562 @@
 import os
+import atexit
 import logging
-from flask import Flask, request, jsonify
+import logging.config
+import logging.handlers
+import queue
+from flask import Flask, Response, request, jsonify
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 import copy
 import enum
+import hashlib
+import itertools
 import json
+import threading
+import time
+import uuid
+import weakref
 
-# Import agents (assume these are implemented in ../agents/)
-import sys
-import os
-sys.path.append(os.path.join(os.path.dirname(__file__), 'agents'))
+# orjson is optional; Flask's stdlib json provider and stdlib json file I/O are used when it is not installed
+try:
+    import orjson
+
+    _json_loads = orjson.loads
+
+    def _json_dumps(obj):
+        return orjson.dumps(obj, default=str, option=orjson.OPT_NON_STR_KEYS)
+except ImportError:
+    orjson = None
+    _json_loads = json.loads
+
+    def _json_dumps(obj):
+        return json.dumps(obj, default=str).encode('utf-8')
+
+# Import agents from the top-level `agents` package (mounted next to app.py in Docker)
 from agents.monitor_agent import MonitorAgent
 from agents.diagnose_agent import DiagnoseAgent
-from agents.fix_agent import FixAgent
+from agents.fix_agent import FixAgent, approve_pending_fix, load_approval_state, store_pending_fix
+
+class ORJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider that serializes with orjson, keeping Flask's fallback for unknown types."""
+
+    def dumps(self, obj, **kwargs):
+        option = orjson.OPT_NON_STR_KEYS
+        if kwargs.get('sort_keys', self.sort_keys):
+            option |= orjson.OPT_SORT_KEYS
+        if kwargs.get('indent'):
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=kwargs.get('default', self.default), option=option).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
 
 app = Flask(__name__)
+if orjson is not None:
+    app.json = ORJSONProvider(app)
+# Key order is the order handlers build their dicts in; sorting every response buys nothing
+app.json.sort_keys = False
 CORS(app)
 
 # Setup logging
-if not os.path.exists('logs'):
-    os.makedirs('logs')
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s %(levelname)s %(message)s',
-    handlers=[
-        logging.FileHandler('logs/pipeline.log'),
-        logging.StreamHandler()
-    ]
-)
+os.makedirs('logs', exist_ok=True)
+LOG_PATH = 'logs/pipeline.log'
+LOG_TAIL_LINES = 200
+
+class _RingBufferHandler(logging.Handler):
+    """Keep the last capacity formatted records in memory so /api/logs needs no disk read."""
+
+    def __init__(self, capacity):
+        super().__init__()
+        self.buf = deque(maxlen=capacity)
+
+    def emit(self, record):
+        self.buf.append(self.format(record) + '\n')
+
+    def lines(self):
+        with self.lock:
+            return list(self.buf)
+
+def _configure_logging(ring):
+    """Route the root logger through a queue drained by one listener thread per process.
+
+    The file handler is a WatchedFileHandler: it reopens pipeline.log after an external
+    logrotate, and appends from several worker processes do not rotate over each other.
+    ring also receives every formatted record for /api/logs.
+    """
+    formatter = logging.Formatter('%(asctime)s %(levelname)s %(message)s')
+    targets = [logging.handlers.WatchedFileHandler(LOG_PATH), logging.StreamHandler(), ring]
+    for handler in targets:
+        handler.setFormatter(formatter)
+    log_queue = queue.SimpleQueue()
+    # The queued record carries only the message; the listener's handlers add the timestamp and level
+    logging.config.dictConfig({
+        'version': 1,
+        'disable_existing_loggers': False,
+        'formatters': {'message': {'format': '%(message)s'}},
+        'handlers': {'queue': {'()': logging.handlers.QueueHandler, 'queue': log_queue, 'formatter': 'message'}},
+        'root': {'level': 'INFO', 'handlers': ['queue']},
+    })
+    listener = logging.handlers.QueueListener(log_queue, *targets, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
+
+# Configure once per process; if the root logger is already set up (an embedding server, a re-import), keep it
+_log_ring = None
+if not logging.getLogger().handlers:
+    _log_ring = _RingBufferHandler(LOG_TAIL_LINES)
+    _log_listener = _configure_logging(_log_ring)
+else:
+    _log_listener = None
 
 # Instantiate agents
 monitor_agent = MonitorAgent()
 diagnose_agent = DiagnoseAgent(os.getenv('OPENAI_API_KEY'))
+atexit.register(diagnose_agent.close)
 fix_agent = FixAgent()
 
-# In-memory store for logs, status, feedback (for demo)
-pipeline_runs = []
-feedback_list = []
-
-approval_state_path = os.path.join(os.path.dirname(__file__), 'approval_state.json')
-
-def safe_dict(obj, _depth=0, _max_depth=10, _visited=None):
-    """Helper function to recursively convert non-serializable objects to strings, with depth and cycle protection."""
-    if _visited is None:
-        _visited = set()
-    if _depth > _max_depth:
-        return str(obj)
-    if id(obj) in _visited:
-        return str(obj)
-    _visited.add(id(obj))
-    if hasattr(obj, '__dict__'):
-        return {k: safe_dict(v, _depth+1, _max_depth, _visited) for k, v in obj.__dict__.items()}
-    elif isinstance(obj, dict):
-        return {k: safe_dict(v, _depth+1, _max_depth, _visited) for k, v in obj.items()}
-    elif isinstance(obj, list):
-        return [safe_dict(v, _depth+1, _max_depth, _visited) for v in obj]
-    elif isinstance(obj, (str, int, float, bool)) or obj is None:
-        return obj
-    else:
-        return str(obj)
-
-def serialize_obj(obj, _visited=None, _depth=0, _max_depth=10):
-    if _visited is None:
-        _visited = set()
-    if _depth > _max_depth:
-        return str(obj)
-    obj_id = id(obj)
-    if obj_id in _visited:
-        return str(obj)
-    _visited.add(obj_id)
-    if hasattr(obj, 'to_dict'):
+# In-memory store for logs, status, feedback (for demo); bounded so a long-running server keeps the newest entries
+HISTORY_LIMIT = 200
+STATUS_RUN_COUNT = 20
+# JSON bytes of the runs /api/status returns, encoded once when the webhook stores them
+pipeline_runs = deque(maxlen=STATUS_RUN_COUNT)
+feedback_list = deque(maxlen=HISTORY_LIMIT)
+_history_lock = threading.Lock()
+
+def _latest(entries, count):
+    """Return the newest count entries of a history deque, oldest first."""
+    with _history_lock:
+        return list(itertools.islice(entries, max(0, len(entries) - count), None))
+
+_PRIMITIVES = (str, int, float, bool, type(None))
+
+# Node kinds for the iterative walker below
+_AS_STR, _ITEMS, _ATTRS, _SEQUENCE, _TO_DICT, _VALUE = range(6)
+
+# Node kind for a class: containers and Enums first, then the duck-typed checks in their original order
+def _serialize_kind(cls):
+    if issubclass(cls, dict):
+        return _ITEMS
+    if issubclass(cls, list):
+        return _SEQUENCE
+    if issubclass(cls, enum.Enum):
+        return _VALUE
+    if hasattr(cls, 'to_dict'):
+        return _TO_DICT
+    if cls.__dictoffset__:
+        return _ATTRS
+    if hasattr(cls, 'value'):
+        return _VALUE
+    return _AS_STR
+
+def _safe_kind(cls):
+    if issubclass(cls, dict):
+        return _ITEMS
+    if issubclass(cls, list):
+        return _SEQUENCE
+    return _ATTRS if cls.__dictoffset__ else _AS_STR
+
+# Exact-type dispatch tables; other classes are resolved once by the functions above and cached.
+# Weak keys let short-lived classes be collected.
+_serialize_kinds = weakref.WeakKeyDictionary({dict: _ITEMS, list: _SEQUENCE})
+_safe_kinds = weakref.WeakKeyDictionary({dict: _ITEMS, list: _SEQUENCE})
+
+def _walk(root, kinds, resolve_kind, max_depth):
+    """Convert root to JSON-safe values using an explicit stack instead of recursion.
+
+    Primitives pass through unchanged and are copied into their parent without a stack
+    round trip. Any other object seen a second time, or nested deeper
+    than max_depth, becomes str(obj). Children are pushed in reverse, so nodes are visited in
+    the same order as a recursive walk would visit them.
+    """
+    visited = set()
+    result = [None]
+    stack = [(result, 0, root, 0)]
+    while stack:
+        parent, key, obj, depth = stack.pop()
+        if isinstance(obj, _PRIMITIVES):
+            parent[key] = obj
+            continue
+        if depth > max_depth or id(obj) in visited:
+            parent[key] = str(obj)
+            continue
+        visited.add(id(obj))
+        cls = type(obj)
+        kind = kinds.get(cls)
+        if kind is None:
+            kind = kinds[cls] = resolve_kind(cls)
+        if kind == _ITEMS or kind == _ATTRS:
+            items = list((obj if kind == _ITEMS else vars(obj)).items())
+            # Primitive values (most nodes) are copied here; only containers and objects are pushed
+            out = dict(items)
+            stack.extend((out, k, v, depth + 1) for k, v in reversed(items) if not isinstance(v, _PRIMITIVES))
+        elif kind == _SEQUENCE:
+            out = list(obj)
+            stack.extend((out, i, out[i], depth + 1) for i in range(len(out) - 1, -1, -1)
+                         if not isinstance(out[i], _PRIMITIVES))
+        elif kind == _TO_DICT:
+            out = obj.to_dict()
+        elif kind == _VALUE:
+            out = obj.value
+        else:
+            out = str(obj)
+        parent[key] = out
+    return result[0]
+
+def _agent_default(obj):
+    """JSON encoder hook: one step of serialize_obj's conversion for a type the encoder lacks."""
+    cls = type(obj)
+    kind = _serialize_kinds.get(cls)
+    if kind is None:
+        kind = _serialize_kinds[cls] = _serialize_kind(cls)
+    if kind == _TO_DICT:
         return obj.to_dict()
-    elif hasattr(obj, '__dict__'):
-        return {k: serialize_obj(v, _visited, _depth+1, _max_depth) for k, v in obj.__dict__.items()}
-    elif isinstance(obj, dict):
-        return {k: serialize_obj(v, _visited, _depth+1, _max_depth) for k, v in obj.items()}
-    elif isinstance(obj, list):
-        return [serialize_obj(v, _visited, _depth+1, _max_depth) for v in obj]
-    elif hasattr(obj, 'value'):
+    if kind == _VALUE:
         return obj.value
-    elif isinstance(obj, enum.Enum):
-        return obj.name
-    elif isinstance(obj, (str, int, float, bool)) or obj is None:
-        return obj
-    else:
-        return str(obj)
+    if kind == _ATTRS:
+        return vars(obj)
+    if kind == _ITEMS:
+        return dict(obj)
+    if kind == _SEQUENCE:
+        return list(obj)
+    return str(obj)
+
+if orjson is not None:
+    def _dumps_agent(obj):
+        return orjson.dumps(obj, default=_agent_default, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+    _AGENT_ENCODE_ERRORS = (orjson.JSONEncodeError,)
+else:
+    def _dumps_agent(obj):
+        return json.dumps(obj, default=_agent_default).encode('utf-8')
+    _AGENT_ENCODE_ERRORS = (TypeError, ValueError, RecursionError)
+
+def encode_agent_json(obj):
+    """Encode agent results to JSON bytes, letting the encoder walk the graph in C.
+
+    Only object graphs the encoder rejects (cycles, excessive nesting) take the
+    serialize_obj walk, which cuts them to strings.
+    """
+    try:
+        return _dumps_agent(obj)
+    except _AGENT_ENCODE_ERRORS:
+        return _dumps_agent(serialize_obj(obj))
+
+def _json_response(obj, status=200):
+    """JSON response encoded by encode_agent_json, unsorted; Werkzeug sets Content-Length from the bytes."""
+    return Response(encode_agent_json(obj) + b'\n', status=status, mimetype='application/json')
+
+def safe_dict(obj, _max_depth=10):
+    """Helper function to convert non-serializable objects to strings, with depth and cycle protection."""
+    return _walk(obj, _safe_kinds, _safe_kind, _max_depth)
+
+def serialize_obj(obj, _max_depth=10):
+    """Convert agent results to JSON-safe values: to_dict() where available, else attributes, items or value."""
+    return _walk(obj, _serialize_kinds, _serialize_kind, _max_depth)
+
+employees_data_path = os.path.join(os.path.dirname(__file__), '../data/sample_employees.json')
+# /api/employees body and ETag, reloaded only when the data file's (inode, mtime_ns, size)
+# changes; the file is not static, FixAgent patches it after an approved fix and its
+# os.replace gives the file a new inode even when size and mtime repeat
+_employees_cache = {'fingerprint': None, 'body': None, 'etag': None, 'error': None}
+_employees_lock = threading.Lock()
+
+def _employees_body():
+    """Return the data file's bytes and ETag, raising ValueError if the file is not valid JSON."""
+    st = os.stat(employees_data_path)
+    fingerprint = (st.st_ino, st.st_mtime_ns, st.st_size)
+    with _employees_lock:
+        if _employees_cache['fingerprint'] == fingerprint:
+            if _employees_cache['error'] is not None:
+                raise ValueError(_employees_cache['error'])
+            return _employees_cache['body'], _employees_cache['etag']
+    # The file is already JSON, so its bytes are served as-is once they have parsed; a corrupt
+    # or hand-edited file is checked once per version rather than on every request
+    with open(employees_data_path, 'rb') as f:
+        body = f.read()
+    try:
+        _json_loads(body)
+    except ValueError as e:
+        with _employees_lock:
+            _employees_cache.update(fingerprint=fingerprint, body=None, etag=None, error=str(e))
+        raise
+    etag = hashlib.sha1(body).hexdigest()
+    with _employees_lock:
+        _employees_cache.update(fingerprint=fingerprint, body=body, etag=etag, error=None)
+    return body, etag
 
 @app.route('/api/employees', methods=['GET'])
 def get_employees():
     """API endpoint for Airflow DAG to pull data from. Reads from data/sample_employees.json."""
-    import os
-    import json
-    data_path = os.path.join(os.path.dirname(__file__), '../data/sample_employees.json')
     try:
-        with open(data_path, 'r') as f:
-            employees = json.load(f)
+        body, etag = _employees_body()
+    except ValueError as e:
+        logging.error("Employee data is not valid JSON: %s", e)
+        return jsonify({'error': 'Employee data is not valid JSON'}), 500
     except Exception as e:
         logging.error(f"Failed to read employee data: {e}")
-        employees = []
-    return jsonify(employees)
+        return jsonify([])
+    response = Response(body, mimetype='application/json')
+    response.set_etag(etag)
+    # Answers If-None-Match with 304 when the client already has this version
+    return response.make_conditional(request)
+
+# Webhooks sent with `Prefer: respond-async` run on this pool; their state is kept for polling via /api/run/<run_id>
+ASYNC_WORKERS = 4
+ASYNC_RUN_LIMIT = 1000
+_pipeline_executor = ThreadPoolExecutor(max_workers=ASYNC_WORKERS, thread_name_prefix='pipeline')
+_async_runs = OrderedDict()
+_async_runs_lock = threading.Lock()
+
+def _set_async_run(run_id, state):
+    with _async_runs_lock:
+        _async_runs[run_id] = state
+        while len(_async_runs) > ASYNC_RUN_LIMIT:
+            _async_runs.popitem(last=False)
+
+def _run_async(run_id, data):
+    _set_async_run(run_id, {'status': 'running'})
+    try:
+        _set_async_run(run_id, {'status': 'done', 'result_json': run_pipeline(data)})
+    except Exception as e:
+        logging.exception("Async pipeline run %s failed", run_id)
+        _set_async_run(run_id, {'status': 'failed', 'error': str(e)})
 
 @app.route('/webhook', methods=['POST'])
 def webhook():
     """Receives failure events from Airflow and triggers agentic workflow"""
-    import time
     data = request.json
-    logging.info(f"Received webhook: {data}")
+    logging.info("Received webhook: %s", data)
+    # Opt-in: answer 202 right away and let the caller poll, instead of holding the request for the agents
+    if 'respond-async' in request.headers.get('Prefer', ''):
+        run_id = uuid.uuid4().hex
+        _set_async_run(run_id, {'status': 'queued'})
+        _pipeline_executor.submit(_run_async, run_id, data)
+        status_url = f'/api/run/{run_id}'
+        response = jsonify({'run_id': run_id, 'status': 'queued', 'status_url': status_url})
+        response.status_code = 202
+        response.headers['Location'] = status_url
+        response.headers['Preference-Applied'] = 'respond-async'
+        return response
+    return Response(run_pipeline(data) + b'\n', mimetype='application/json')
+
+@app.route('/api/run/<run_id>', methods=['GET'])
+def get_run(run_id):
+    """Return the state of a webhook accepted with `Prefer: respond-async`."""
+    with _async_runs_lock:
+        state = _async_runs.get(run_id)
+    if state is None:
+        return jsonify({'error': f'Unknown run: {run_id}'}), 404
+    result_json = state.get('result_json')
+    if result_json is None:
+        return jsonify({'run_id': run_id, **state})
+    # A finished run keeps its result as the JSON run_pipeline returned; splice it in as-is
+    return Response(b'{"run_id":"%b","status":"done","result":%b}\n' % (run_id.encode('utf-8'), result_json),
+                    mimetype='application/json')
+
+class _Lazy:
+    """Log argument that calls func(arg) only if the record is actually formatted."""
+    __slots__ = ('func', 'arg')
+
+    def __init__(self, func, arg):
+        self.func = func
+        self.arg = arg
+
+    def __str__(self):
+        return str(self.func(self.arg))
+
+def run_pipeline(data):
+    """Run monitor, diagnosis and fix for one failure event and record the run for /api/status.
+
+    Returns the JSON bytes of the result. Each agent's result is encoded once and that
+    encoding is reused by its log line, the stored run and the returned result.
+    """
     step_timings = {}
     error_info = {}
-    start_time = time.time()
+    start_ns = time.perf_counter_ns()
     # 1. Monitor agent processes the failure
     try:
-        t0 = time.time()
+        t0 = time.perf_counter_ns()
         monitor_result = monitor_agent.process_webhook(data)
-        t1 = time.time()
-        step_timings['monitor_agent'] = t1 - t0
-        logging.info(f"MonitorAgent completed in {step_timings['monitor_agent']:.2f}s: {serialize_obj(monitor_result)}")
+        step_timings['monitor_agent'] = (time.perf_counter_ns() - t0) / 1e9
+        monitor_json = encode_agent_json(monitor_result)
+        logging.info("MonitorAgent completed in %.2fs: %s", step_timings['monitor_agent'], _Lazy(bytes.decode, monitor_json))
     except Exception as e:
         error_info['monitor_agent'] = str(e)
-        logging.error(f"MonitorAgent error: {e}")
+        logging.error("MonitorAgent error: %s", e)
         monitor_result = {'error': str(e)}
+        monitor_json = encode_agent_json(monitor_result)
     # 2. If intervention triggered, run diagnosis and fix
     diagnosis_result = None
-    fix_result = None
+    diagnosis_json = fix_json = b'null'
     if monitor_result.get('status') == 'intervention_triggered':
         try:
-            t0 = time.time()
+            t0 = time.perf_counter_ns()
             diagnosis_result = diagnose_agent.diagnose_failure(data)
-            t1 = time.time()
-            step_timings['diagnose_agent'] = t1 - t0
-            logging.info(f"DiagnoseAgent completed in {step_timings['diagnose_agent']:.2f}s: {serialize_obj(diagnosis_result)}")
+            step_timings['diagnose_agent'] = (time.perf_counter_ns() - t0) / 1e9
+            diagnosis_json = encode_agent_json(diagnosis_result or None)
+            logging.info("DiagnoseAgent completed in %.2fs: %s", step_timings['diagnose_agent'], _Lazy(bytes.decode, diagnosis_json))
         except Exception as e:
             error_info['diagnose_agent'] = str(e)
-            logging.error(f"DiagnoseAgent error: {e}")
+            logging.error("DiagnoseAgent error: %s", e)
             diagnosis_result = {'error': str(e)}
+            diagnosis_json = encode_agent_json(diagnosis_result)
         try:
-            t0 = time.time()
+            t0 = time.perf_counter_ns()
             fix_result = fix_agent.apply_fix(
                 diagnosis_result.__dict__ if hasattr(diagnosis_result, '__dict__') else diagnosis_result,
                 data
             )
-            t1 = time.time()
-            step_timings['fix_agent'] = t1 - t0
-            logging.info(f"FixAgent completed in {step_timings['fix_agent']:.2f}s: {serialize_obj(fix_result)}")
+            step_timings['fix_agent'] = (time.perf_counter_ns() - t0) / 1e9
+            fix_json = encode_agent_json(fix_result or None)
+            logging.info("FixAgent completed in %.2fs: %s", step_timings['fix_agent'], _Lazy(bytes.decode, fix_json))
         except Exception as e:
             error_info['fix_agent'] = str(e)
-            logging.error(f"FixAgent error: {e}")
-            fix_result = {'error': str(e)}
-    total_time = time.time() - start_time
-    logging.info(f"/webhook total execution time: {total_time:.2f}s | Step timings: {step_timings} | Errors: {error_info}")
-    # Log pipeline run with serialization
-    pipeline_runs.append({
-        'event': data,
-        'monitor': serialize_obj(monitor_result),
-        'diagnosis': serialize_obj(diagnosis_result) if diagnosis_result else None,
-        'fix': serialize_obj(fix_result) if fix_result else None,
-        'timings': step_timings,
-        'errors': error_info,
-        'timestamp': datetime.now().isoformat()
-    })
-    return jsonify({
-        'monitor': serialize_obj(monitor_result),
-        'diagnosis': serialize_obj(diagnosis_result) if diagnosis_result else None,
-        'fix': serialize_obj(fix_result) if fix_result else None,
-        'timings': step_timings,
-        'errors': error_info
-    })
+            logging.error("FixAgent error: %s", e)
+            fix_json = encode_agent_json({'error': str(e)})
+    total_time = (time.perf_counter_ns() - start_ns) / 1e9
+    logging.info("/webhook total execution time: %.2fs | Step timings: %s | Errors: %s", total_time, step_timings, error_info)
+    # The stored run is the result's fields framed by the event and a timestamp
+    fields = b'"monitor":%b,"diagnosis":%b,"fix":%b,"timings":%b,"errors":%b' % (
+        monitor_json, diagnosis_json, fix_json, encode_agent_json(step_timings), encode_agent_json(error_info))
+    run_json = b'{"event":%b,%b,"timestamp":%b}' % (
+        encode_agent_json(data), fields, encode_agent_json(datetime.now().isoformat()))
+    with _history_lock:
+        pipeline_runs.append(run_json)
+    return b'{%b}' % fields
+
+LOG_MAX_LINES = 5000
+LOG_TAIL_CHUNK = 64 * 1024
+# Last tail read, reused while the log file's (size, mtime_ns) and the line count are unchanged
+_log_tail_cache = {'fingerprint': None, 'lines': None}
+_log_tail_lock = threading.Lock()
+
+def _tail_lines(path, count):
+    """Return the last count lines of path (with line endings) without reading the whole file."""
+    st = os.stat(path)
+    fingerprint = (st.st_size, st.st_mtime_ns, count)
+    with _log_tail_lock:
+        if _log_tail_cache['fingerprint'] == fingerprint:
+            return _log_tail_cache['lines']
+    # Walk backwards a chunk at a time until count complete lines are in hand, like tail -n
+    chunks = []
+    newlines = 0
+    end = st.st_size
+    with open(path, 'rb') as f:
+        while end > 0 and newlines <= count:
+            start = max(0, end - LOG_TAIL_CHUNK)
+            f.seek(start)
+            chunk = f.read(end - start)
+            chunks.append(chunk)
+            newlines += chunk.count(b'\n')
+            end = start
+    lines = b''.join(reversed(chunks)).splitlines(keepends=True)
+    lines = [line.decode('utf-8', errors='replace') for line in lines[-count:]] if count else []
+    with _log_tail_lock:
+        _log_tail_cache.update(fingerprint=fingerprint, lines=lines)
+    return lines
 
 @app.route('/api/logs', methods=['GET'])
 def get_logs():
-    """Return recent pipeline logs"""
+    """Return recent pipeline logs; ?lines=N asks for up to LOG_MAX_LINES from the file."""
+    count = max(0, min(request.args.get('lines', LOG_TAIL_LINES, type=int), LOG_MAX_LINES))
+    # The ring only holds this process's records since startup; older or longer history comes from the file
+    if _log_ring is not None and count <= LOG_TAIL_LINES and len(_log_ring.buf) >= count:
+        return _json_response({'logs': _log_ring.lines()[-count:] if count > 0 else []})
     try:
-        with open('logs/pipeline.log', 'r') as f:
-            lines = f.readlines()[-200:]
-        return jsonify({'logs': lines})
+        return _json_response({'logs': _tail_lines(LOG_PATH, count)})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/status', methods=['GET'])
 def get_status():
     """Return recent pipeline run status and agent actions"""
-    # Ensure all runs are serializable
-    serialized_runs = [serialize_obj(run) for run in pipeline_runs[-20:]]
-    return jsonify({'pipeline_runs': serialized_runs})
+    # Runs are stored as JSON, so the response is assembled without encoding them again
+    body = b'{"pipeline_runs":[' + b','.join(_latest(pipeline_runs, STATUS_RUN_COUNT)) + b']}\n'
+    return Response(body, mimetype='application/json')
 
 @app.route('/api/feedback', methods=['POST'])
 def post_feedback():
     """Accept user feedback on fixes"""
     data = request.json
-    feedback_list.append({
+    entry = {
         'feedback': data.get('feedback'),
         'rating': data.get('rating'),
         'timestamp': datetime.now().isoformat()
-    })
+    }
+    with _history_lock:
+        feedback_list.append(entry)
     return jsonify({'status': 'received'})
 
 @app.route('/api/feedback', methods=['GET'])
 def get_feedback():
     """Return feedback history"""
-    return jsonify({'feedback': feedback_list[-20:]})
+    return _json_response({'feedback': _latest(feedback_list, 20)})
 
 @app.route('/api/diagnose', methods=['POST'])
 def api_diagnose():
     """API endpoint to trigger diagnosis agent from external services (e.g., MonitorAgent)."""
     data = request.json
-    logging.info(f"[API] Received diagnosis request: {data}")
+    logging.info("[API] Received diagnosis request: %s", data)
     result = diagnose_agent.diagnose_failure(data.get('failure_event', data))
-    return jsonify(serialize_obj(result)), 200
+    return _json_response(result)
+
+@app.route('/api/invalidate_diagnosis', methods=['POST'])
+def invalidate_diagnosis():
+    """Evict cached LLM diagnoses similar to a topic (free text or a failure event)."""
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({'error': 'Expected a JSON object'}), 400
+    topic = data.get('failure_event') or data.get('topic')
+    if not isinstance(topic, (str, dict)) or not topic:
+        return jsonify({'error': 'topic (string) or failure_event (object) is required'}), 400
+    min_similarity = data.get('min_similarity')
+    if min_similarity is not None and (isinstance(min_similarity, bool) or not isinstance(min_similarity, (int, float))):
+        return jsonify({'error': 'min_similarity must be a number'}), 400
+    removed = diagnose_agent.invalidate_similar(
+        topic, float(min_similarity) if min_similarity is not None else None)
+    return jsonify({'removed': removed})
 
 # --- Endpoints for fix agent simulation (optional, for demo) ---
-@app.route('/api/update_schema', methods=['POST'])
-def update_schema():
-    # Simulate schema update (no-op for demo)
-    return jsonify({'status': 'schema updated'})
-
-@app.route('/api/add_transformation', methods=['POST'])
-def add_transformation():
-    # Simulate adding transformation (no-op for demo)
-    return jsonify({'status': 'transformation added'})
-
-@app.route('/api/update_config', methods=['POST'])
-def update_config():
-    # Simulate config update (no-op for demo)
-    return jsonify({'status': 'config updated'})
-
-@app.route('/api/notify', methods=['POST'])
-def notify():
-    # Simulate manual intervention notification (no-op for demo)
-    return jsonify({'status': 'notified'})
-
-@app.route('/api/verify_fix', methods=['POST'])
-def verify_fix():
-    # Simulate fix verification (always success for demo)
-    return jsonify({'status': 'verified'})
-
-@app.route('/api/rollback', methods=['POST'])
-def rollback():
-    # Simulate rollback (no-op for demo)
-    return jsonify({'status': 'rolled back'})
+# Simulated actions (no-ops for demo) and their response bodies, serialized once at import
+_ACTION_BODIES = {
+    name: f"{app.json.dumps(body)}\n".encode('utf-8')
+    for name, body in {
+        'update_schema': {'status': 'schema updated'},
+        'add_transformation': {'status': 'transformation added'},
+        'update_config': {'status': 'config updated'},
+        'notify': {'status': 'notified'},
+        'verify_fix': {'status': 'verified'},
+        'rollback': {'status': 'rolled back'},
+    }.items()
+}
+
+@app.route('/api/action/<name>', methods=['POST'])
+def run_action(name):
+    """Run a simulated fix action by name."""
+    body = _ACTION_BODIES.get(name)
+    if body is None:
+        return jsonify({'error': f'Unknown action: {name}'}), 404
+    return Response(body, mimetype='application/json')
+
+# The original per-action paths stay available as aliases; their own endpoint names keep
+# Werkzeug from redirecting /api/action/<name> to them
+for _action in _ACTION_BODIES:
+    app.add_url_rule(f'/api/{_action}', endpoint=_action, view_func=run_action,
+                     defaults={'name': _action}, methods=['POST'])
+
+@app.route('/api/apply_fixes_batch', methods=['POST'])
+def apply_fixes_batch():
+    """Apply several fix actions in one request; results are returned in request order."""
+    items = request.get_json(silent=True)
+    if not isinstance(items, list):
+        return jsonify({'error': 'Expected a JSON list of fix actions'}), 400
+    # Simulate applying each action (no-op for demo)
+    results = [{'action': item.get('action') if isinstance(item, dict) else None, 'status': 'applied'} for item in items]
+    return jsonify({'results': results})
 
 @app.route('/api/pending_fix', methods=['GET'])
 def api_pending_fix():
@@ -257,29 +575,34 @@ def health_check():
     """Health check endpoint for root URL."""
     return jsonify({'status': 'ok', 'message': 'Flask API is running'}), 200
 
+# (epoch second, formatted time) of the last access log line; a burst within one second formats it once.
+# Replaced as a whole tuple, so concurrent requests never see a mismatched pair.
+_access_log_time = (None, '')
+
+def _access_time():
+    global _access_log_time
+    now = int(time.time())
+    second, formatted = _access_log_time
+    if second != now:
+        formatted = time.strftime('%d/%b/%Y %H:%M:%S', time.localtime(now))
+        _access_log_time = (now, formatted)
+    return formatted
+
 @app.after_request
 def after_request(response):
     # Log every request to the log file and console
-    logging.info(f"{request.remote_addr} - - [{datetime.now().strftime('%d/%b/%Y %H:%M:%S')}] \"{request.method} {request.path} {request.environ.get('SERVER_PROTOCOL')}\" {response.status_code} -")
+    # Formatted by logging only once the record passes the level check
+    logging.info('%s - - [%s] "%s %s %s" %s -', request.remote_addr, _access_time(), request.method,
+                 request.path, request.environ.get('SERVER_PROTOCOL'), response.status_code)
     return response
 
+# Approval state lives in backend/approval_state.json, shared with FixAgent: reads are
+# served from its parsed-file cache and updates take the same cross-process lock
 def set_pending_fix(fix_desc, failure):
-    with open(approval_state_path, 'w') as f:
-        json.dump({"pending_fix": fix_desc, "failure": failure, "approved": False}, f)
+    store_pending_fix(fix_desc, failure)
 
 def get_pending_fix():
-    try:
-        with open(approval_state_path, 'r') as f:
-            return json.load(f)
-    except Exception:
-        return {"pending_fix": None, "approved": False}
-
-def approve_pending_fix():
-    state = get_pending_fix()
-    state["approved"] = True
-    with open(approval_state_path, 'w') as f:
-        json.dump(state, f)
-    return state
+    return load_approval_state()
 
 if __name__ == "__main__":
     app.run(host="0.0.0.0", port=5000)
\ No newline at end of file
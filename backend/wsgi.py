@@ -0,0 +1,5 @@
+"""WSGI entry point for the backend, e.g. `gunicorn wsgi:application` from backend/."""
+
+from app import app
+
+application = app
@@ -7,6 +7,8 @@ the self-healing capabilities of the pipeline.
 """
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import json
 import time
 import sys
@@ -16,6 +18,11 @@ from datetime import datetime
 FLASK_API_URL = "http://localhost:5000"
 AIRFLOW_API_URL = "http://localhost:8080"
 
+# One keep-alive session for every call the demo makes against the local services
+SESSION = requests.Session()
+SESSION.mount("http://", HTTPAdapter(pool_connections=4, pool_maxsize=10,
+                                     max_retries=Retry(total=3, backoff_factor=0.2)))
+
 def print_step(step, description):
     """Print a formatted step description"""
     print(f"\n{'='*60}")
@@ -25,7 +32,7 @@ def print_step(step, description):
 def check_service(url, service_name):
     """Check if a service is running"""
     try:
-        response = requests.get(url, timeout=5)
+        response = SESSION.get(url, timeout=5)
         if response.status_code == 200:
             print(f"✅ {service_name} is running at {url}")
             return True
@@ -42,18 +49,13 @@ def simulate_schema_error():
     
     # First, get the normal response
     try:
-        response = requests.get(f"{FLASK_API_URL}/api/employees")
+        response = SESSION.get(f"{FLASK_API_URL}/api/employees")
         if response.status_code == 200:
             employees = response.json()
             print(f"✅ Retrieved {len(employees)} employee records")
             
-            # Create a modified version with missing email field
-            modified_employees = []
-            for emp in employees:
-                modified_emp = emp.copy()
-                if 'email' in modified_emp:
-                    del modified_emp['email']  # Remove email field to cause schema error
-                modified_employees.append(modified_emp)
+            # Create a modified version with missing email field; each record is built once without it
+            modified_employees = [{k: v for k, v in emp.items() if k != 'email'} for emp in employees]
             
             print(f"⚠️  Modified data: Removed 'email' field from all records")
             print(f"📊 Modified data sample: {json.dumps(modified_employees[0], indent=2)}")
@@ -81,7 +83,7 @@ def trigger_pipeline_failure():
     }
     
     try:
-        response = requests.post(f"{FLASK_API_URL}/webhook", json=webhook_payload)
+        response = SESSION.post(f"{FLASK_API_URL}/webhook", json=webhook_payload)
         if response.status_code == 200:
             result = response.json()
             print(f"✅ Webhook triggered successfully")
@@ -103,7 +105,7 @@ def check_agent_workflow():
     print_step(3, "Checking Agent Workflow Status")
     
     try:
-        response = requests.get(f"{FLASK_API_URL}/api/status")
+        response = SESSION.get(f"{FLASK_API_URL}/api/status")
         if response.status_code == 200:
             status = response.json()
             runs = status.get('pipeline_runs', [])
@@ -117,7 +119,6 @@ def check_agent_workflow():
                     return status
                 monitor = latest_run.get('monitor', {})
                 if isinstance(monitor, str):
-                    import json
                     try:
                         monitor = json.loads(monitor)
                     except Exception:
@@ -156,7 +157,7 @@ def view_agent_logs():
     print_step(4, "Viewing Agent Logs")
     
     try:
-        response = requests.get(f"{FLASK_API_URL}/api/logs")
+        response = SESSION.get(f"{FLASK_API_URL}/api/logs")
         if response.status_code == 200:
             logs_data = response.json()
             logs = logs_data.get('logs', [])
@@ -185,7 +186,7 @@ def submit_feedback():
     }
     
     try:
-        response = requests.post(f"{FLASK_API_URL}/api/feedback", json=feedback_payload)
+        response = SESSION.post(f"{FLASK_API_URL}/api/feedback", json=feedback_payload)
         if response.status_code == 200:
             print(f"✅ Feedback submitted successfully")
             print(f"📝 Rating: {feedback_payload['rating']}/5")
@@ -0,0 +1,134 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from agents.diagnose_agent import DiagnoseAgent, _LLMDiagnosisCache, _SemanticDiagnosisCache
+
+
+class _HashEmbeddings:
+    """Deterministic stand-in for the embedding client: equal texts give equal vectors."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def embed_query(self, text):
+        self.calls += 1
+        return [float(b) for b in text.encode("utf-8")[:64].ljust(64, b" ")]
+
+
+class LLMDiagnosisCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.path = os.path.join(tempfile.mkdtemp(), "cache.sqlite3")
+
+    def _rows(self, cache):
+        return cache._conn.execute("SELECT prompt_hash FROM diagnoses ORDER BY prompt_hash").fetchall()
+
+    def _open(self, **kwargs):
+        cache = _LLMDiagnosisCache(self.path, **kwargs)
+        self.addCleanup(cache.close)
+        return cache
+
+    def test_expired_rows_are_deleted_on_open(self):
+        cache = self._open(ttl_seconds=-1)
+        cache.set("old", {"root_cause": "x"})
+        self.assertEqual(self._rows(self._open()), [])
+
+    def test_set_purges_expired_rows_once_the_interval_passes(self):
+        cache = self._open(ttl_seconds=-1, purge_interval=0)
+        cache.set("old", {"root_cause": "x"})
+        cache.ttl_seconds = 60
+        cache.set("new", {"root_cause": "y"})
+        self.assertEqual(self._rows(cache), [("new",)])
+        self.assertEqual(cache.get("new"), {"root_cause": "y"})
+
+
+class DiagnosisHistoryTest(unittest.TestCase):
+    def test_concurrent_diagnoses_keep_history_ordered(self):
+        agent = DiagnoseAgent()
+        failures = [{"error_type": "connection_error", "error_message": f"connection timeout {i}"}
+                    for i in range(400)]
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            results = list(pool.map(agent.diagnose_failure, failures))
+        timestamps = [ts for ts, _ in agent.diagnosis_history]
+        self.assertEqual(timestamps, sorted(timestamps))
+        self.assertEqual(sorted(record.timestamp for _, record in agent.diagnosis_history),
+                         sorted(result["timestamp"] for result in results))
+        summary = agent.get_diagnosis_summary()
+        self.assertEqual(summary["total_diagnoses"], 400)
+        self.assertEqual(summary["recent_diagnoses"], 400)
+        self.assertEqual(summary["confidence_counts"], {"medium": 400})
+
+    def test_summary_counts_only_the_last_day(self):
+        agent = DiagnoseAgent()
+        agent.diagnose_failure({"error_message": "connection timeout"})
+        ts, record = agent.diagnosis_history[0]
+        agent.diagnosis_history[0] = (ts - 2 * 86400, record)
+        agent.diagnose_failure({"error_message": "connection timeout"})
+        summary = agent.get_diagnosis_summary()
+        self.assertEqual((summary["total_diagnoses"], summary["recent_diagnoses"]), (2, 1))
+
+
+class SemanticDiagnosisCacheTest(unittest.TestCase):
+    EMAIL = {"dag_id": "d", "task_id": "t", "error_type": "schema_validation",
+             "error_message": "Record 0: Missing required field 'email'"}
+
+    def setUp(self):
+        self.agent = DiagnoseAgent(None, track_history=False)
+        self.agent._embeddings = _HashEmbeddings()
+        self.agent._semantic_cache = _SemanticDiagnosisCache(threshold=0.9)
+        self.agent._llm_cache = _LLMDiagnosisCache(os.path.join(tempfile.mkdtemp(), "cache.sqlite3"))
+        self.addCleanup(self.agent.close)
+
+    def _store(self, failure, diagnosis):
+        key = self.agent.prompt_hash(self.agent._create_diagnosis_prompt(failure))
+        self.agent._llm_cache.set(key, diagnosis)
+        vector = self.agent._embed(self.agent._semantic_text(failure))
+        self.agent._semantic_cache.add(vector, diagnosis, self.agent._semantic_guard(failure), key)
+        return key, vector
+
+    def test_hit_requires_matching_quoted_tokens(self):
+        _, vector = self._store(self.EMAIL, {"root_cause": "Missing fields: email"})
+        phone = {**self.EMAIL, "error_message": "Record 0: Missing required field 'phone'"}
+        cache = self.agent._semantic_cache
+        self.assertIsNone(cache.get(vector, self.agent._semantic_guard(phone)))
+        self.assertEqual(cache.get(vector, self.agent._semantic_guard(self.EMAIL)), {"root_cause": "Missing fields: email"})
+
+    def test_invalidation_also_evicts_the_exact_prompt_row(self):
+        key, vector = self._store(self.EMAIL, {"root_cause": "wrong"})
+        self.assertEqual(self.agent.invalidate_similar(self.EMAIL), 1)
+        self.assertIsNone(self.agent._llm_cache.get(key))
+        self.assertIsNone(self.agent._semantic_cache.get(vector, self.agent._semantic_guard(self.EMAIL)))
+
+    def test_invalidating_a_failure_evicts_its_row_without_a_semantic_entry(self):
+        key = self.agent.prompt_hash(self.agent._create_diagnosis_prompt(self.EMAIL))
+        self.agent._llm_cache.set(key, {"root_cause": "wrong"})
+        self.assertEqual(self.agent.invalidate_similar(self.EMAIL), 1)
+        self.assertIsNone(self.agent._llm_cache.get(key))
+
+    def test_only_the_single_flight_owner_embeds(self):
+        release = threading.Event()
+        kickoffs = []
+
+        def fake_kickoff(prompt, key, vector=None, guard=None):
+            kickoffs.append(key)
+            release.wait(timeout=5)
+            return {"root_cause": "Missing fields: email"}
+
+        self.agent._kickoff_diagnosis = fake_kickoff
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            futures = [pool.submit(self.agent._crew_diagnose, dict(self.EMAIL)) for _ in range(8)]
+            while not self.agent._inflight:
+                time.sleep(0.01)
+            time.sleep(0.05)
+            release.set()
+            results = [future.result() for future in futures]
+        self.assertEqual(results, [{"root_cause": "Missing fields: email"}] * 8)
+        self.assertEqual(len(kickoffs), 1)
+        self.assertEqual(self.agent._embeddings.calls, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,68 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from agents import fix_agent
+from agents.fix_agent import FixAgent, _JsonFileCache
+
+
+class BoundedFixHistoryTest(unittest.TestCase):
+    def test_evicted_fixes_leave_the_index(self):
+        agent = FixAgent("http://127.0.0.1:9", history_limit=2)
+        # Manual fixes are stored for approval, so no backend call is made
+        agent._request_approval = lambda fix, failure: f"Pending human approval: {fix}"
+        records = [agent.apply_fix({"suggested_fixes": ["Manual review required"]}, {"error_message": str(i)})
+                   for i in range(3)]
+        self.assertEqual([r.fix_id for r in agent.fix_history], [r["fix_id"] for r in records[1:]])
+        self.assertEqual(set(agent._history_index), {r["fix_id"] for r in records[1:]})
+        self.assertEqual(agent.rollback_fix(records[0]["fix_id"]), f"Unknown fix: {records[0]['fix_id']}")
+
+
+class CrewBypassCounterTest(unittest.TestCase):
+    def test_concurrent_bypasses_are_all_counted(self):
+        agent = FixAgent("http://127.0.0.1:9")
+        diagnosis = {"suggested_fixes": ["Retry task"], "confidence": "high"}
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            self.assertTrue(all(pool.map(agent._crew_unneeded, [diagnosis] * 2000)))
+        self.assertEqual(agent.crew_bypassed, 2000)
+
+
+class SingleFlightKeyTest(unittest.TestCase):
+    FAILURE = {"error_message": "boom", 1: "numeric key", "details": {2: "nested"}}
+
+    def _post(self, agent):
+        agent._post_fix_action = lambda action, failure: f"API call '{action}' successful"
+        return agent._single_flight_fix_action("retry_task", self.FAILURE)
+
+    def test_non_str_keys_do_not_break_the_request_key(self):
+        self.assertEqual(self._post(FixAgent("http://127.0.0.1:9")), "API call 'retry_task' successful")
+
+    def test_stdlib_fallback_accepts_mixed_keys(self):
+        def stdlib_dumps(obj, pretty=False, sort_keys=False):
+            return json.dumps(obj, default=str, sort_keys=sort_keys).encode("utf-8")
+
+        with mock.patch.object(fix_agent, "_json_dumps", stdlib_dumps):
+            self.assertEqual(self._post(FixAgent("http://127.0.0.1:9")), "API call 'retry_task' successful")
+
+
+class JsonFileCacheTest(unittest.TestCase):
+    def test_same_size_replacement_with_equal_mtime_is_reloaded(self):
+        path = Path(tempfile.mkdtemp()) / "state.json"
+        path.write_bytes(b'{"approved": false}')
+        cache = _JsonFileCache()
+        self.assertEqual(cache.get(path), {"approved": False})
+        mtime_ns = os.stat(path).st_mtime_ns
+        # Written beside the file and renamed over it, as the approval writer does
+        tmp = path.with_suffix(".tmp")
+        tmp.write_bytes(b'{"approved": true }')
+        os.utime(tmp, ns=(mtime_ns, mtime_ns))
+        os.replace(tmp, path)
+        self.assertEqual(cache.get(path), {"approved": True})
+
+
+if __name__ == "__main__":
+    unittest.main()
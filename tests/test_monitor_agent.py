@@ -0,0 +1,143 @@
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from unittest import mock
+
+from agents import monitor_agent
+from agents.monitor_agent import MonitorAgent
+
+
+def setUpModule():
+    # Interventions fall back to POSTing the backend; keep the suite off the network
+    patcher = mock.patch.object(monitor_agent, "_SESSION")
+    session = patcher.start()
+    session.post.return_value.content = b'{"root_cause": "stub"}'
+    unittest.addModuleCleanup(patcher.stop)
+
+
+class CoalescedDiagnosisTest(unittest.TestCase):
+    def test_distinct_concurrent_errors_get_their_own_diagnosis(self):
+        agent = MonitorAgent()
+        started = threading.Barrier(2)
+
+        def fake_diagnosis(event):
+            # Both calls are in flight at the same time
+            started.wait(timeout=5)
+            time.sleep(0.05)
+            return {"root_cause": event["error_message"]}
+
+        agent._run_trigger_diagnosis = fake_diagnosis
+        events = [
+            {"dag_id": "d", "task_id": "t", "error_type": "schema_validation",
+             "error_message": "Missing required field 'email'"},
+            {"dag_id": "d", "task_id": "t", "error_type": "connection_error",
+             "error_message": "connection refused"},
+        ]
+        results = [None, None]
+
+        def run(i):
+            results[i] = agent._crew_trigger_diagnosis(events[i])
+
+        threads = [threading.Thread(target=run, args=(i,)) for i in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results[0], {"root_cause": "Missing required field 'email'"})
+        self.assertEqual(results[1], {"root_cause": "connection refused"})
+
+    def test_identical_concurrent_errors_share_one_call(self):
+        agent = MonitorAgent()
+        calls = []
+        release = threading.Event()
+
+        def fake_diagnosis(event):
+            calls.append(event)
+            release.wait(timeout=5)
+            return {"root_cause": event["error_message"]}
+
+        agent._run_trigger_diagnosis = fake_diagnosis
+        event = {"dag_id": "d", "task_id": "t", "error_type": "connection_error", "error_message": "timeout"}
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(agent._crew_trigger_diagnosis(dict(event))))
+                   for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        while not agent._inflight:
+            time.sleep(0.01)
+        time.sleep(0.05)
+        release.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, [{"root_cause": "timeout"}] * 2)
+
+
+class BoundedHistoryTest(unittest.TestCase):
+    def _event(self, i):
+        return {"dag_id": "d", "task_id": "t", "execution_date": str(i),
+                "error_type": "unknown", "error_message": f"error {i}"}
+
+    def test_resolve_targets_oldest_retained_event(self):
+        agent = MonitorAgent(dedupe_ttl=0, history_limit=2)
+        for i in range(3):
+            agent.process_webhook(self._event(i))
+        self.assertTrue(agent.mark_failure_resolved("d", "t"))
+        self.assertEqual([e["resolved"] for e in agent.failure_history], [True, False])
+        self.assertEqual(len(agent._by_key[("d", "t")]), 2)
+
+    def test_index_drops_tasks_that_left_history(self):
+        agent = MonitorAgent(dedupe_ttl=0, history_limit=1)
+        agent.process_webhook(self._event(0))
+        agent.process_webhook({**self._event(1), "task_id": "other"})
+        self.assertFalse(agent.mark_failure_resolved("d", "t"))
+        self.assertTrue(agent.mark_failure_resolved("d", "other"))
+
+
+class RecentFailureWindowTest(unittest.TestCase):
+    def test_expired_tasks_leave_the_window_index(self):
+        agent = MonitorAgent(dedupe_ttl=0)
+        old = (datetime.now() - timedelta(hours=2)).isoformat()
+        agent.process_webhook({"dag_id": "d", "task_id": "stale", "error_type": "unknown", "timestamp": old})
+        agent.process_webhook({"dag_id": "d", "task_id": "fresh", "error_type": "unknown"})
+        agent._evict_expired(time.time())
+        self.assertEqual(set(agent._by_task), {"fresh"})
+
+
+class ConcurrentWebhookTest(unittest.TestCase):
+    TASKS = ("extract", "transform", "load", "notify")
+
+    def _hammer(self, agent, count=400):
+        webhooks = [{"dag_id": "d", "task_id": self.TASKS[i % len(self.TASKS)], "execution_date": str(i),
+                     "error_type": "unknown", "error_message": f"error {i}"} for i in range(count)]
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            return list(pool.map(agent.process_webhook, webhooks))
+
+    def _assert_indexes_match_history(self, agent):
+        for (dag_id, task_id), events in agent._by_key.items():
+            expected = [e for e in agent.failure_history if (e["dag_id"], e["task_id"]) == (dag_id, task_id)]
+            self.assertEqual(list(events), expected)
+
+    def test_concurrent_webhooks_are_all_recorded(self):
+        agent = MonitorAgent(dedupe_ttl=0)
+        results = self._hammer(agent)
+        self.assertEqual(len(agent.failure_history), 400)
+        self.assertEqual({task: len(entries) for task, entries in agent._by_task.items()},
+                         dict.fromkeys(self.TASKS, 100))
+        # Only a task's first two events can be under the threshold; later ones intervene
+        self.assertLessEqual(sum(r["status"] == "monitored" for r in results), 2 * len(self.TASKS))
+        self.assertEqual({r["status"] for r in results} - {"monitored"}, {"intervention_triggered"})
+        self._assert_indexes_match_history(agent)
+
+    def test_concurrent_webhooks_evict_consistently(self):
+        agent = MonitorAgent(dedupe_ttl=0, history_limit=50)
+        self._hammer(agent)
+        self.assertEqual(len(agent.failure_history), 50)
+        self.assertEqual(sum(len(events) for events in agent._by_key.values()), 50)
+        self._assert_indexes_match_history(agent)
+
+
+if __name__ == "__main__":
+    unittest.main()